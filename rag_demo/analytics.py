@@ -1,22 +1,175 @@
 from segment import analytics
 import streamlit as st
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
 import uuid
+from datetime import datetime, timezone
 
 SESSION_ID = "SESSION_ID"
 
-try:
-    segment_key = st.secrets["SEGMENT_WRITE_KEY"]
-    if segment_key == "" or segment_key is None:
-        ANALYTICS_ENABLED = False
-    else:
-        ANALYTICS_ENABLED = True
+# Dispatch tuning
+QUEUE_SIZE = 1000
+BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 2.0
+MAX_PROPERTY_CHARS = 1000
+
+
+class SegmentSink:
+    def send(self, events: list[dict]):
+        for event in events:
+            analytics.track(
+                user_id=event["user_id"],
+                event=event["event"],
+                properties=event["properties"],
+                timestamp=datetime.fromtimestamp(event["timestamp"], tz=timezone.utc),
+            )
+
+
+class FileSink:
+    """Appends events as JSON lines to a local file (stand-in for Segment)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, events: list[dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, default=str) + "\n")
+
+
+def _load_sink():
+    try:
+        segment_key = st.secrets.get("SEGMENT_WRITE_KEY")
+        file_path = st.secrets.get("ANALYTICS_FILE_PATH")
+    except Exception as e:
+        logging.warning(f"Analytics disabled, could not read secrets: {e}")
+        return None
+
+    if segment_key:
         analytics.write_key = segment_key
-except:
-    ANALYTICS_ENABLED = False
+        return SegmentSink()
+    if file_path:
+        return FileSink(file_path)
+    logging.info("Analytics disabled: no SEGMENT_WRITE_KEY or ANALYTICS_FILE_PATH")
+    return None
+
+
+def _truncate(value):
+    if isinstance(value, str) and len(value) > MAX_PROPERTY_CHARS:
+        return value[:MAX_PROPERTY_CHARS] + f"... [{len(value)} chars]"
+    if isinstance(value, dict):
+        return {k: _truncate(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_truncate(v) for v in value]
+    return value
+
+
+class AnalyticsDispatcher:
+    """Bounded in-process queue drained in batches by a background thread.
+
+    `enqueue` never blocks: when the queue is full the event is dropped and
+    counted, so tracking can never add latency to a response.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.events = queue.Queue(maxsize=QUEUE_SIZE)
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    def enqueue(self, event: dict):
+        self._ensure_started()
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="analytics-dispatch", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _next_batch(self, timeout: float) -> list[dict]:
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch: list[dict]):
+        if not batch:
+            return
+        for event in batch:
+            event["properties"] = _truncate(event["properties"])
+        # The atexit flush can run while the dispatch thread is mid-send, so
+        # sink writes are serialized; the counters have their own lock, which
+        # enqueue also takes, so a slow sink never blocks a request
+        with self._send_lock:
+            try:
+                self.sink.send(batch)
+                sent, failed = len(batch), 0
+            except Exception as e:
+                sent, failed = 0, len(batch)
+                logging.warning(f"Failed to send {len(batch)} analytics events: {e}")
+        with self._lock:
+            self.sent += sent
+            self.failed += failed
+
+    def _run(self):
+        while True:
+            self._send(self._next_batch(FLUSH_INTERVAL_SECONDS))
+
+    def flush(self):
+        """Sends whatever is still queued (called at interpreter exit)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= BATCH_SIZE:
+                self._send(batch)
+                batch = []
+        self._send(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self.events.qsize(),
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+_sink = _load_sink()
+ANALYTICS_ENABLED = _sink is not None
+dispatcher = AnalyticsDispatcher(_sink) if ANALYTICS_ENABLED else None
 
 
 def track(user_id: str, event_name: str, properties: dict):
-    """Simple wrapper for Segment's analytics.track()
+    """Queues an analytics event; delivery happens on a background thread.
 
     Args:
         user_id (str): Unique identifier for session/user
@@ -30,6 +183,11 @@ def track(user_id: str, event_name: str, properties: dict):
     if SESSION_ID not in st.session_state:
         st.session_state[SESSION_ID] = str(uuid.uuid4())
 
-    properties["session_id"] = st.session_state[SESSION_ID]
-
-    analytics.track(user_id=user_id, event=event_name, properties=properties)
+    dispatcher.enqueue(
+        {
+            "user_id": user_id,
+            "event": event_name,
+            "properties": {**properties, "session_id": st.session_state[SESSION_ID]},
+            "timestamp": time.time(),
+        }
+    )
@@ -0,0 +1,116 @@
+# Deterministic markdown answers for simple result shapes, so the final LLM call can be skipped
+
+import re
+
+import streamlit as st
+
+LINK_PHRASE = "Please click here to access the knowledge graph:"
+DEFAULT_CONFIDENCE_THRESHOLD = 0.75
+
+MAX_LIST_ITEMS = 50
+MAX_TABLE_ROWS = 20
+MAX_TABLE_COLUMNS = 4
+MAX_CELL_CHARS = 80
+
+# Questions that ask for reasoning rather than a lookup always go to the LLM
+_REASONING_RE = re.compile(
+    r"\b(why|explain|compare|comparison|difference|differ|summari[sz]e|describe"
+    r"|how does|how do)\b",
+    re.IGNORECASE,
+)
+_DISPLAY_KEYS = ("name", "title", "experiment_title", "asciiname")
+
+
+def _display_value(value):
+    """Returns a scalar for a cell, or None when the value has no simple rendering."""
+    if isinstance(value, dict):
+        # Nodes render as their identifying property
+        for key in _DISPLAY_KEYS:
+            if value.get(key) not in (None, ""):
+                return _display_value(value[key])
+        return None
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(v, (dict, list, tuple)) for v in value):
+            return ", ".join(str(v) for v in value)
+        return None
+    if value is None:
+        return ""
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _cells(result: list[dict]) -> tuple[list[str], list[list[str]]] | None:
+    columns = list(result[0].keys())
+    rows = []
+    for row in result:
+        if list(row.keys()) != columns:
+            return None
+        cells = [_display_value(row[column]) for column in columns]
+        if any(cell is None for cell in cells):
+            return None
+        if cells not in rows:
+            rows.append(cells)
+    return columns, rows
+
+
+def _confidence(question: str, columns: list[str], rows: list[list[str]]) -> float:
+    """Scores how safely the result can be answered without the LLM (0..1)."""
+    if _REASONING_RE.search(question or ""):
+        return 0.0
+    if any(len(cell) > MAX_CELL_CHARS for row in rows for cell in row):
+        return 0.3
+    if len(columns) == 1:
+        # Past the display cap the list would be cut short, so leave it to the LLM
+        return 0.95 if len(rows) <= MAX_LIST_ITEMS else 0.5
+    if len(columns) <= MAX_TABLE_COLUMNS and len(rows) <= MAX_TABLE_ROWS:
+        return 0.9 - 0.05 * (len(columns) - 2)
+    return 0.4
+
+
+def _confidence_threshold() -> float:
+    try:
+        threshold = st.secrets.get("RENDER_CONFIDENCE_THRESHOLD")
+    except Exception:
+        threshold = None
+    return DEFAULT_CONFIDENCE_THRESHOLD if threshold is None else float(threshold)
+
+
+def render_answer(question: str, result, neo4j_link: str) -> str | None:
+    """Renders counts, single-column lists and small tables as markdown.
+
+    Returns None when the result shape is not simple enough (or the question
+    asks for reasoning), in which case the caller should use the LLM.
+    """
+    if not isinstance(result, list) or not result:
+        return None
+    if not all(isinstance(row, dict) and row for row in result):
+        return None
+
+    cells = _cells(result)
+    if cells is None:
+        return None
+    columns, rows = cells
+
+    if _confidence(question, columns, rows) < _confidence_threshold():
+        return None
+
+    footer = f"\n\n{LINK_PHRASE} {neo4j_link}"
+
+    # Single number, e.g. RETURN count(s)
+    if len(rows) == 1 and len(columns) == 1:
+        value = rows[0][0]
+        if re.fullmatch(r"-?\d+(\.\d+)?", value):
+            return f"The result for `{columns[0]}` is **{value}**.{footer}"
+
+    if len(columns) == 1:
+        shown = rows[:MAX_LIST_ITEMS]
+        lines = [f"Found {len(rows)} result{'s' if len(rows) != 1 else ''}:"]
+        lines += [f"- {row[0]}" for row in shown]
+        if len(rows) > len(shown):
+            lines.append(f"- ... and {len(rows) - len(shown)} more")
+        return "\n".join(lines) + footer
+
+    lines = [f"Found {len(rows)} result{'s' if len(rows) != 1 else ''}:", ""]
+    lines.append("| " + " | ".join(columns) + " |")
+    lines.append("|" + "---|" * len(columns))
+    lines += ["| " + " | ".join(row) + " |" for row in rows]
+    return "\n".join(lines) + footer
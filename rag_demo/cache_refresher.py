@@ -0,0 +1,225 @@
+# Keeps the schema, entity lexicon and gazetteer fresh from a background thread.
+#
+# The thread polls a cheap fingerprint of the graph (node count per label and
+# relationship count per type, both served from Neo4j's count store) and only
+# rebuilds what changed: a new or removed label or relationship type refreshes
+# the schema, and a label whose count moved gets its lexicon slice rebuilt.
+
+import logging
+import threading
+import time
+
+import streamlit as st
+from entity_stats import (
+    EntityStats,
+    get_entity_stats,
+    load_label_stats,
+    set_entity_stats,
+)
+from gazetteer import GEO_LABELS, load_gazetteer, set_gazetteer
+from lexicon import EntityLexicon, build_label_slice, get_lexicon, set_lexicon
+from negative_cache import unresolvable_literals
+from normalize_properties import normalized_labels
+from property_metadata import get_entity_properties
+
+DEFAULT_REFRESH_SECONDS = 300
+
+
+def graph_fingerprint(graph) -> dict[str, int]:
+    """Returns {":Label": node count, "[:TYPE]": relationship count, "~Label": 1}.
+
+    "~Label" marks a label whose nodes are all normalized (see
+    normalize_properties), so finishing the normalization job, or loading
+    nodes it has not seen yet, counts as a schema change.
+    """
+    fingerprint = {}
+    for row in graph.query("CALL db.labels() YIELD label RETURN label", {}):
+        label = row["label"]
+        count = graph.query(f"MATCH (n:`{label}`) RETURN count(n) AS count", {})
+        fingerprint[f":{label}"] = count[0]["count"]
+    rel_types = graph.query(
+        "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType",
+        {},
+    )
+    for row in rel_types:
+        rel = row["relationshipType"]
+        count = graph.query(f"MATCH ()-[r:`{rel}`]->() RETURN count(r) AS count", {})
+        fingerprint[f"[:{rel}]"] = count[0]["count"]
+    for label in normalized_labels(graph):
+        fingerprint[f"~{label}"] = 1
+    return fingerprint
+
+
+def _refresh_interval() -> float:
+    try:
+        return float(st.secrets.get("CACHE_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS))
+    except Exception:
+        return DEFAULT_REFRESH_SECONDS
+
+
+class CacheRefresher:
+    """Builds the lexicon and gazetteer, then keeps them and the schema current.
+
+    `on_schema_change` is called (from the refresher thread) after the graph's
+    schema has been refreshed, so callers can re-derive their label sets.
+    """
+
+    def __init__(self, graph, properties_map: dict, labels, on_schema_change=None):
+        self.graph = graph
+        self.properties_map = properties_map
+        self.labels = set(labels)
+        self.on_schema_change = on_schema_change
+        self.interval = _refresh_interval()
+        self.fingerprint = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.metrics = {
+            "checks": 0,
+            "refreshes": 0,
+            "labels_rebuilt": 0,
+            "schema_refreshes": 0,
+            "errors": 0,
+            "last_check": None,
+            "last_change": None,
+            "last_refresh_seconds": None,
+            "last_error": None,
+        }
+
+    def warm(self):
+        """Builds the lexicon and gazetteer from scratch and records the fingerprint."""
+        start = time.perf_counter()
+        try:
+            self.fingerprint = graph_fingerprint(self.graph)
+            unresolvable_literals.set_fingerprint(self.fingerprint)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not fingerprint the graph: {e}")
+        set_lexicon(EntityLexicon.build(self.graph, self.properties_map, self.labels))
+        set_gazetteer(load_gazetteer(self.graph, self.labels))
+        set_entity_stats(EntityStats.build(self.graph, self._stats_labels()))
+        self._record_refresh(start)
+        if self.fingerprint is not None:
+            # Without a fingerprint no change can be detected, so the data is
+            # not known to be current
+            self.metrics["last_check"] = time.time()
+
+    def _stats_labels(self) -> list[str]:
+        # Geographic ambiguity is settled by the gazetteer's label order
+        return sorted(
+            label
+            for label in self.labels
+            if label in self.properties_map and label not in GEO_LABELS
+        )
+
+    def _labels_touching(self, rel_types: set[str]) -> set[str]:
+        """Labels at either end of the given relationship types."""
+        labels = set()
+        for rel in self.graph.structured_schema.get("relationships", []):
+            if rel["type"] in rel_types:
+                labels.update((rel["start"], rel["end"]))
+        return labels
+
+    def refresh_once(self):
+        """Compares the fingerprint with the last one and rebuilds what changed."""
+        with self._lock:
+            start = time.perf_counter()
+            fingerprint = graph_fingerprint(self.graph)
+            self.metrics["checks"] += 1
+            previous = self.fingerprint
+            if previous is None or fingerprint == previous:
+                self.fingerprint = fingerprint
+                unresolvable_literals.set_fingerprint(fingerprint)
+                self.metrics["last_check"] = time.time()
+                return
+
+            changed = {
+                key
+                for key in fingerprint.keys() | previous.keys()
+                if fingerprint.get(key) != previous.get(key)
+            }
+            logging.info(f"🔄 Graph changed: {sorted(changed)}")
+
+            if fingerprint.keys() != previous.keys():
+                # Labels or relationship types were added or removed
+                self.graph.refresh_schema()
+                self.metrics["schema_refreshes"] += 1
+                if self.on_schema_change:
+                    self.labels = set(self.on_schema_change())
+                    # The callback re-describes the properties for the new schema
+                    self.properties_map = get_entity_properties().matchable_map()
+
+            changed_labels = {key[1:] for key in changed if key.startswith(":")}
+            lexicon = get_lexicon()
+            for label in sorted(changed_labels & self.labels):
+                if label in self.properties_map:
+                    matcher, linker = build_label_slice(
+                        self.graph, label, self.properties_map[label]
+                    )
+                    lexicon.replace_label(label, matcher, linker)
+                    self.metrics["labels_rebuilt"] += 1
+            if changed_labels & set(GEO_LABELS):
+                set_gazetteer(load_gazetteer(self.graph, self.labels))
+
+            # Degrees move with node counts and with the relationships around them
+            changed_rels = {key[2:-1] for key in changed if key.startswith("[:")}
+            entity_stats = get_entity_stats()
+            stale = changed_labels | self._labels_touching(changed_rels)
+            for label in sorted(stale & set(self._stats_labels())):
+                entity_stats.replace_label(label, load_label_stats(self.graph, label))
+
+            # Kept until the rebuild completes: if it raises, the next poll
+            # still sees the change and retries it
+            self.fingerprint = fingerprint
+            unresolvable_literals.set_fingerprint(fingerprint)
+            self.metrics["last_change"] = time.time()
+            # Only a completed rebuild counts as a check of current data
+            self.metrics["last_check"] = time.time()
+            self._record_refresh(start)
+
+    def _record_refresh(self, start: float):
+        duration = time.perf_counter() - start
+        self.metrics["refreshes"] += 1
+        self.metrics["last_refresh_seconds"] = round(duration, 3)
+        logging.info(f"🔄 Caches refreshed in {duration:.1f}s")
+
+    def _run(self):
+        # A failed pass is logged and retried next interval; letting it escape
+        # would end the thread and the caches would never refresh again
+        warmed = False
+        while True:
+            try:
+                if warmed:
+                    self.refresh_once()
+                else:
+                    self.warm()
+                    warmed = True
+            except Exception as e:
+                self.metrics["errors"] += 1
+                self.metrics["last_error"] = str(e)
+                logging.exception(f"⚠️ Cache refresh failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="cache-refresher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        """Refresh metrics plus staleness: seconds since the last successful check."""
+        last_check = self.metrics["last_check"]
+        return {
+            **self.metrics,
+            "interval_seconds": self.interval,
+            "staleness_seconds": (
+                round(time.time() - last_check, 1) if last_check else None
+            ),
+            "lexicon_labels": len(get_lexicon().slices),
+            "negative_cache_entries": len(unresolvable_literals),
+            "negative_cache_hits": unresolvable_literals.hits,
+        }
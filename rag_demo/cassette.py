@@ -0,0 +1,192 @@
+# Records LLM and Neo4j calls to a cassette file and serves them back offline.
+#
+# Enable in secrets.toml:
+#
+#   CASSETTE_MODE = "record"   # or "replay"; unset makes live calls only
+#   CASSETTE_PATH = "cassettes/production.jsonl"
+#
+# Each line of the cassette is one call: {"kind", "key", "request", "response"},
+# where `key` hashes the request. Replay serves identical requests from the
+# file, in recorded order when the same request was made more than once, so a
+# pipeline change can be benchmarked on recorded traffic deterministically.
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+
+import streamlit as st
+from langchain_community.graphs.graph_document import GraphDocument
+from langchain_community.graphs.graph_store import GraphStore
+from langchain_core.messages import AIMessage, HumanMessage, convert_to_messages
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable
+
+RECORD = "record"
+REPLAY = "replay"
+DEFAULT_CASSETTE_PATH = "cassettes/session.jsonl"
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def request_key(kind: str, request: dict) -> str:
+    canonical = json.dumps(
+        {"kind": kind, "request": request}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str):
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._responses = defaultdict(list)
+        self._latest = {}
+        self._served = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._responses[entry["key"]].append(entry["response"])
+                    self._latest[entry["kind"]] = entry["response"]
+        logging.info(f"📼 Loaded {len(self._responses)} recorded requests from {self.path}")
+
+    def record(self, kind: str, request: dict, response):
+        key = request_key(kind, request)
+        # Round-trip through JSON so recorded and replayed values look the same
+        response = json.loads(json.dumps(response, default=str))
+        with self._lock:
+            self._latest[kind] = response
+            recorded = self._responses[key]
+            if recorded and recorded[-1] == response:
+                # Repeated identical calls (e.g. schema refreshes) are stored once
+                return
+            recorded.append(response)
+            entry = {"kind": kind, "key": key, "request": request, "response": response}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+    def replay(self, kind: str, request: dict):
+        key = request_key(kind, request)
+        with self._lock:
+            recorded = self._responses.get(key)
+            if not recorded:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded {kind} response for {key[:12]}")
+            # Serve repeats in recorded order, then keep serving the last one
+            index = min(self._served[key], len(recorded) - 1)
+            self._served[key] += 1
+            self.hits += 1
+            return recorded[index]
+
+    def latest(self, kind: str):
+        """Returns the most recently recorded response of `kind`, or None."""
+        return self._latest.get(kind)
+
+
+@functools.lru_cache(maxsize=1)
+def get_cassette() -> Cassette | None:
+    """Returns the process-wide cassette, or None when recording is off."""
+    try:
+        mode = st.secrets.get("CASSETTE_MODE")
+        path = st.secrets.get("CASSETTE_PATH", DEFAULT_CASSETTE_PATH)
+    except Exception:
+        mode = None
+    if mode not in (RECORD, REPLAY):
+        return None
+    logging.info(f"📼 Cassette {mode} mode: {path}")
+    return Cassette(path, mode)
+
+
+def _llm_request(stage: str, input, kwargs: dict) -> dict:
+    if isinstance(input, PromptValue):
+        messages = input.to_messages()
+    elif isinstance(input, str):
+        messages = [HumanMessage(content=input)]
+    else:
+        messages = convert_to_messages(input)
+    request = {
+        "stage": stage,
+        "messages": [{"type": m.type, "content": m.content} for m in messages],
+    }
+    if kwargs.get("stop"):
+        request["stop"] = kwargs["stop"]
+    return request
+
+
+class RecordingModel(Runnable):
+    """Passes calls through to `model` and records each request and response."""
+
+    def __init__(self, stage: str, model, cassette: Cassette):
+        self.stage = stage
+        self.model = model
+        self.cassette = cassette
+
+    def invoke(self, input, config=None, **kwargs):
+        response = self.model.invoke(input, config, **kwargs)
+        self.cassette.record(
+            "llm",
+            _llm_request(self.stage, input, kwargs),
+            {"content": response.content},
+        )
+        return response
+
+
+class ReplayModel(Runnable):
+    """Stand-in chat model that answers from the cassette."""
+
+    def __init__(self, stage: str, cassette: Cassette):
+        self.stage = stage
+        self.cassette = cassette
+
+    def invoke(self, input, config=None, **kwargs):
+        response = self.cassette.replay("llm", _llm_request(self.stage, input, kwargs))
+        return AIMessage(content=response["content"])
+
+
+class ReplayGraph(GraphStore):
+    """Stand-in for Neo4jGraph that answers queries from the cassette.
+
+    The schema is the last one recorded, so no database connection is needed.
+    """
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        recorded = cassette.latest("schema") or {}
+        self.schema = recorded.get("schema", "")
+        self.structured_schema = recorded.get("structured_schema", {})
+
+    @property
+    def get_schema(self) -> str:
+        return self.schema
+
+    @property
+    def get_structured_schema(self) -> dict:
+        return self.structured_schema
+
+    def query(self, query: str, params: dict = {}) -> list[dict]:
+        return self.cassette.replay("graph", {"query": query, "params": params})
+
+    def refresh_schema(self):
+        # The recorded schema is fixed for the whole replay
+        pass
+
+    def add_graph_documents(
+        self, graph_documents: list[GraphDocument], include_source: bool = False
+    ):
+        raise NotImplementedError("A replayed graph is read-only")
@@ -0,0 +1,115 @@
+# Bounded per-session conversation memory shared by the interpreter, Cypher and final-answer prompts
+
+import logging
+import re
+from collections import deque
+
+import streamlit as st
+from token_budget import truncate_tokens
+
+MEMORY_KEY = "CONVERSATION_MEMORY"
+DEFAULT_MAX_TURNS = 3
+DEFAULT_TURN_TOKENS = 150
+
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*•]|\d+\.)\s+")
+
+
+def compact_bot_output(text: str, max_tokens: int, max_list_items: int = 5) -> str:
+    """Shrinks a bot answer so it fits the per-turn token budget.
+
+    Links are reduced to their label, long result lists keep only the first
+    few items plus a count, and whatever is still over budget is truncated.
+    """
+    text = _LINK_RE.sub(r"\1", text or "")
+
+    lines = []
+    list_items = 0
+    for line in text.splitlines():
+        if _LIST_ITEM_RE.match(line):
+            list_items += 1
+            if list_items > max_list_items:
+                continue
+        elif list_items > max_list_items:
+            lines.append(f"... ({list_items - max_list_items} more items)")
+            list_items = 0
+        else:
+            list_items = 0
+        lines.append(line)
+    if list_items > max_list_items:
+        lines.append(f"... ({list_items - max_list_items} more items)")
+    text = "\n".join(lines).strip()
+
+    return truncate_tokens(text, max_tokens)
+
+
+class ConversationMemory:
+    """Ring buffer of the most recent (question, answer) turns.
+
+    The buffer is updated incrementally from the chat transcript, so each new
+    question only processes the messages added since the previous one.
+    """
+
+    def __init__(
+        self, max_turns: int = DEFAULT_MAX_TURNS, turn_tokens: int = DEFAULT_TURN_TOKENS
+    ):
+        self.max_turns = max_turns
+        self.turn_tokens = turn_tokens
+        self.turns = deque(maxlen=max_turns)
+        self._synced = 0
+        self._pending_input = None
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append(
+            {
+                "input": question,
+                "output": compact_bot_output(answer, self.turn_tokens),
+            }
+        )
+
+    def sync(self, messages: list[dict]):
+        """Consumes chat messages appended since the last call.
+
+        A user message becomes a turn once the following AI message arrives,
+        so the question currently being answered is never part of the history.
+        """
+        if len(messages) < self._synced:
+            # Transcript was reset
+            self.turns.clear()
+            self._synced = 0
+            self._pending_input = None
+
+        for msg in messages[self._synced :]:
+            if msg["role"] == "user":
+                self._pending_input = msg["content"]
+            elif msg["role"] == "ai" and self._pending_input is not None:
+                self.add_turn(self._pending_input, msg["content"])
+                self._pending_input = None
+        self._synced = len(messages)
+
+    def as_turns(self) -> list[dict[str, str]]:
+        return list(self.turns)
+
+    def as_text(self) -> str:
+        return "\n".join(
+            f"User: {turn['input']}\nBot: {turn['output']}" for turn in self.turns
+        )
+
+
+def get_session_memory() -> ConversationMemory:
+    """Returns the conversation memory for the current Streamlit session."""
+    if MEMORY_KEY not in st.session_state:
+        try:
+            max_turns = int(st.secrets["MEMORY_MAX_TURNS"])
+        except Exception as e:
+            logging.info(f"Using default MEMORY_MAX_TURNS ({DEFAULT_MAX_TURNS}): {e!r}")
+            max_turns = DEFAULT_MAX_TURNS
+        try:
+            turn_tokens = int(st.secrets["MEMORY_TURN_TOKENS"])
+        except Exception as e:
+            logging.info(
+                f"Using default MEMORY_TURN_TOKENS ({DEFAULT_TURN_TOKENS}): {e!r}"
+            )
+            turn_tokens = DEFAULT_TURN_TOKENS
+        st.session_state[MEMORY_KEY] = ConversationMemory(max_turns, turn_tokens)
+    return st.session_state[MEMORY_KEY]
@@ -0,0 +1,176 @@
+# Rewrites generated Cypher so inline literals become $parameters.
+#
+# Neo4j caches execution plans by query text, so `Variable {name: "pr"}` and
+# `Variable {name: "tas"}` are planned separately. Lifting literals into
+# parameters lets identical query shapes share one cached plan, and the
+# normalized text doubles as a cache key for the query shape.
+
+import re
+
+PARAM_PREFIX = "p"
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?(?:[eE][+-]?\d+)?")
+# Variable-length patterns such as [:REL*1..3] cannot take parameters.
+_RANGE_RE = re.compile(r"\*\s*\d*\s*(?:\.\.\s*\d*)?")
+
+# Cypher string escapes; \uXXXX and \UXXXXXXXX name a code point in hex
+_ESCAPES = {
+    "t": "\t",
+    "b": "\b",
+    "n": "\n",
+    "r": "\r",
+    "f": "\f",
+    "'": "'",
+    '"': '"',
+    "\\": "\\",
+}
+_UNICODE_ESCAPES = {"u": 4, "U": 8}
+_HEX_RE = re.compile(r"[0-9a-fA-F]+")
+
+
+def _read_string(query: str, start: int) -> tuple[str, int]:
+    """Returns the unescaped value of the string literal at `start` and the index after it."""
+    quote = query[start]
+    i = start + 1
+    chars = []
+    while i < len(query):
+        c = query[i]
+        if c == "\\" and i + 1 < len(query):
+            nxt = query[i + 1]
+            if nxt in _ESCAPES:
+                chars.append(_ESCAPES[nxt])
+                i += 2
+                continue
+            width = _UNICODE_ESCAPES.get(nxt)
+            digits = query[i + 2 : i + 2 + width] if width else ""
+            if width and len(digits) == width and _HEX_RE.fullmatch(digits):
+                chars.append(chr(int(digits, 16)))
+                i += 2 + width
+                continue
+            # Not a Cypher escape: leave the query for Neo4j to reject
+            raise ValueError(f"Unsupported escape sequence \\{nxt} in Cypher string")
+        if c == quote:
+            return "".join(chars), i + 1
+        chars.append(c)
+        i += 1
+    raise ValueError("Unterminated string literal in Cypher query")
+
+
+def _is_identifier_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+def parameterize_cypher(query: str, params: dict = None) -> tuple[str, dict]:
+    """Extracts string and number literals from a Cypher query into parameters.
+
+    Args:
+        query (str): Cypher text as generated by the LLM
+        params (dict): Existing parameters; literals are added under new names
+
+    Returns:
+        tuple[str, dict]: The normalized query text and the merged parameters.
+        The query is returned unchanged if it cannot be tokenized safely.
+    """
+    original = dict(params or {})
+    params = dict(original)
+    out = []
+    index = 0
+    i = 0
+    n = len(query)
+
+    try:
+        while i < n:
+            c = query[i]
+
+            # Comments and backtick-quoted identifiers are copied verbatim
+            if query.startswith("//", i):
+                end = query.find("\n", i)
+                end = n if end == -1 else end
+                out.append(query[i:end])
+                i = end
+                continue
+            if query.startswith("/*", i):
+                end = query.find("*/", i + 2)
+                end = n if end == -1 else end + 2
+                out.append(query[i:end])
+                i = end
+                continue
+            if c == "`":
+                end = query.find("`", i + 1)
+                if end == -1:
+                    raise ValueError("Unterminated identifier in Cypher query")
+                out.append(query[i : end + 1])
+                i = end + 1
+                continue
+
+            if c == "$":
+                # Existing parameter reference
+                j = i + 1
+                while j < n and _is_identifier_char(query[j]):
+                    j += 1
+                out.append(query[i:j])
+                i = j
+                continue
+
+            if c == "*":
+                match = _RANGE_RE.match(query, i)
+                out.append(match.group(0))
+                i = match.end()
+                continue
+
+            if c in ("'", '"'):
+                value, end = _read_string(query, i)
+                name = _next_param_name(params, index)
+                index += 1
+                params[name] = value
+                out.append(f"${name}")
+                i = end
+                continue
+
+            if c.isdigit():
+                prev = query[i - 1] if i > 0 else ""
+                if _is_identifier_char(prev) or prev == ".":
+                    # Part of an identifier such as `s1` or `CMIP6`
+                    out.append(c)
+                    i += 1
+                    continue
+                match = _NUMBER_RE.match(query, i)
+                end = match.end()
+                if end < n and _is_identifier_char(query[end]):
+                    # Not a standalone number, e.g. `1st`
+                    out.append(query[i:end])
+                    i = end
+                    continue
+                text = match.group(0)
+                name = _next_param_name(params, index)
+                index += 1
+                params[name] = (
+                    float(text) if any(ch in text for ch in ".eE") else int(text)
+                )
+                out.append(f"${name}")
+                i = end
+                continue
+
+            if _is_identifier_char(c):
+                # Copy whole identifiers so trailing digits are never split off
+                j = i
+                while j < n and _is_identifier_char(query[j]):
+                    j += 1
+                out.append(query[i:j])
+                i = j
+                continue
+
+            out.append(c)
+            i += 1
+    except ValueError:
+        return query, original
+
+    return "".join(out), params
+
+
+def _next_param_name(params: dict, index: int) -> str:
+    name = f"{PARAM_PREFIX}{index}"
+    while name in params:
+        index += 1
+        name = f"{PARAM_PREFIX}{index}"
+    return name
@@ -0,0 +1,80 @@
+# Narrows and ranks the labels a triple literal resolves to, using schema and graph statistics
+
+from collections import Counter, defaultdict
+
+
+def relationship_endpoints(
+    structured_schema: dict,
+) -> dict[str, list[tuple[str, str]]]:
+    """Maps each relationship type to its (start label, end label) pairs."""
+    endpoints = defaultdict(list)
+    for rel in (structured_schema or {}).get("relationships", []):
+        pair = (rel["start"], rel["end"])
+        if pair not in endpoints[rel["type"]]:
+            endpoints[rel["type"]].append(pair)
+    return dict(endpoints)
+
+
+def _endpoint_labels(pairs, index: int, other: str, schema_labels) -> list[str]:
+    # Labels on side `index` of the relationship, restricted by the other side
+    # when the triple names it as a schema label
+    if other in schema_labels:
+        matching = [pair[index] for pair in pairs if pair[1 - index] == other]
+        if matching:
+            return matching
+    return [pair[index] for pair in pairs]
+
+
+def candidate_labels(
+    literal: str,
+    triples: list[tuple[str, str, str]],
+    endpoints: dict[str, list[tuple[str, str]]],
+    schema_labels,
+) -> list[str]:
+    """Returns the labels `literal` can have given the predicates it appears with.
+
+    E.g. the object of PRODUCES_VARIABLE can only be a Variable. Labels implied
+    by more triples come first; an empty list means the predicates say nothing.
+    """
+    scores = Counter()
+    for s, p, o in triples:
+        pairs = endpoints.get(p)
+        if not pairs:
+            continue
+        if s == literal:
+            scores.update(_endpoint_labels(pairs, 0, o, schema_labels))
+        if o == literal:
+            scores.update(_endpoint_labels(pairs, 1, s, schema_labels))
+    return [label for label, _ in scores.most_common() if label in schema_labels]
+
+
+# A tied match is kept alongside the best one when it has at least this share
+# of the best match's degree
+KEEP_DEGREE_RATIO = 0.5
+
+
+def rank_matches(
+    matches: list[tuple[str, str]], predicates: set[str], entity_stats
+) -> list[tuple[str, str]]:
+    """Ranks (label, node id) matches of one literal and drops the implausible ones.
+
+    Matches are ordered by how many of the question's predicates the node
+    takes part in, then by degree. Only matches tied with the best on
+    predicates and close to it in degree are kept, so "historical" goes
+    forward as the Experiment it is rather than every label that has it.
+    """
+    if len(matches) <= 1:
+        return matches
+
+    def score(match):
+        degree, rels = entity_stats.get(*match) or (0, {})
+        return sum(1 for p in predicates if rels.get(p)), degree
+
+    ranked = sorted(matches, key=score, reverse=True)
+    best_predicates, best_degree = score(ranked[0])
+    return [
+        match
+        for match in ranked
+        if score(match)[0] == best_predicates
+        and score(match)[1] >= best_degree * KEEP_DEGREE_RATIO
+    ]
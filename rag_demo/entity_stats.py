@@ -0,0 +1,62 @@
+# Per-entity graph statistics (degree and relationship types), used to rank ambiguous matches
+
+import logging
+import time
+
+
+def load_label_stats(graph, label: str) -> dict[str, tuple[int, dict[str, int]]]:
+    """Returns {element id: (degree, {relationship type: count})} for `label` nodes."""
+    rows = graph.query(
+        f"MATCH (n:`{label}`) OPTIONAL MATCH (n)-[r]-() "
+        "WITH n, type(r) AS rel, count(r) AS count "
+        "RETURN elementId(n) AS id, collect([rel, count]) AS rels",
+        {},
+    )
+    stats = {}
+    for row in rows:
+        rels = {rel: count for rel, count in row["rels"] or [] if rel is not None}
+        stats[row["id"]] = (sum(rels.values()), rels)
+    return stats
+
+
+class EntityStats:
+    """Degree and relationship-type participation per node, grouped by label."""
+
+    def __init__(self, labels: dict[str, dict] = None):
+        self.labels = labels or {}
+
+    @classmethod
+    def build(cls, graph, labels) -> "EntityStats":
+        start = time.perf_counter()
+        stats = {}
+        for label in labels:
+            try:
+                stats[label] = load_label_stats(graph, label)
+            except Exception as e:
+                logging.warning(f"⚠️ Could not load entity statistics for {label}: {e}")
+        size = sum(len(nodes) for nodes in stats.values())
+        logging.info(
+            f"📈 Built entity statistics: {size} nodes "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return cls(stats)
+
+    def get(self, label: str, node_id: str) -> tuple[int, dict[str, int]] | None:
+        return self.labels.get(label, {}).get(node_id)
+
+    def replace_label(self, label: str, stats: dict):
+        # Swap the dict whole so readers never see a partly rebuilt label
+        self.labels = {**self.labels, label: stats}
+
+
+# Built and refreshed in the background (see cache_refresher); empty until then
+_entity_stats = EntityStats()
+
+
+def get_entity_stats() -> EntityStats:
+    return _entity_stats
+
+
+def set_entity_stats(entity_stats: EntityStats):
+    global _entity_stats
+    _entity_stats = entity_stats
@@ -0,0 +1,181 @@
+# Learns, per question bucket, which triple-extraction mode finds verified triples
+# and how many attempts that takes, and plans the next extraction accordingly
+
+import atexit
+import copy
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+import streamlit as st
+
+FREE_MODE = "free"
+SCHEMA_MODE = "schema"
+
+# Buckets with fewer recorded runs than this borrow the global statistics
+MIN_SAMPLES = 5
+# Start in schema mode when free mode finds verified triples less often than this
+FREE_MODE_MIN_SUCCESS = 0.25
+# Share of questions that use the default plan, so free mode keeps being measured
+EXPLORE_RATE = 0.1
+
+GLOBAL_BUCKET = "*"
+
+# How often recorded runs are written to EXTRACTION_STATS_PATH
+SAVE_INTERVAL_SECONDS = 30.0
+
+_WH_RE = re.compile(
+    r"^(how many|how much|what|which|who|where|when|list|show|is|are|does|do)\b"
+)
+
+
+def _label_terms(label: str) -> str:
+    # "ClimateModel" -> "climate model"
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", label).lower()
+
+
+def question_bucket(question: str, labels) -> str:
+    """Classifies a question by its leading question word and the labels it mentions."""
+    text = re.sub(r"\s+", " ", question.lower()).strip()
+    wh = _WH_RE.match(text)
+    mentioned = sorted(
+        label
+        for label in labels
+        if _label_terms(label) in text or label.lower() in text.replace(" ", "")
+    )
+    return f"{wh.group(1) if wh else 'other'}|{','.join(mentioned)}"
+
+
+def _empty_bucket() -> dict:
+    return {
+        "runs": 0,
+        "successes": 0,
+        # Schema-mode attempts each successful run needed (0 when free mode succeeded)
+        "schema_attempts": [],
+        FREE_MODE: {"tries": 0, "hits": 0},
+        SCHEMA_MODE: {"tries": 0, "hits": 0},
+    }
+
+
+class ExtractionStats:
+    """Per-bucket extraction outcomes, optionally persisted to a JSON file.
+
+    Recording only updates memory; a background thread writes the file every
+    SAVE_INTERVAL_SECONDS when something changed, and once more at exit.
+    """
+
+    def __init__(self, path: str = None, max_history: int = 50):
+        self.path = path
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        # Serializes file writes between the saver thread and the atexit flush
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._thread = None
+        self._buckets = defaultdict(_empty_bucket)
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._buckets.update(json.load(f))
+            except Exception as e:
+                logging.warning(f"⚠️ Could not load extraction stats from {path}: {e}")
+
+    def record(self, bucket: str, outcomes: list[tuple[str, bool]]):
+        """Records one run as its (mode, found verified triples) attempts, in order."""
+        with self._lock:
+            for key in (bucket, GLOBAL_BUCKET):
+                stats = self._buckets[key]
+                stats["runs"] += 1
+                schema_attempts = 0
+                for mode, hit in outcomes:
+                    stats[mode]["tries"] += 1
+                    stats[mode]["hits"] += int(hit)
+                    schema_attempts += mode == SCHEMA_MODE
+                    if hit:
+                        stats["successes"] += 1
+                        stats["schema_attempts"].append(schema_attempts)
+                        del stats["schema_attempts"][: -self.max_history]
+                        break
+            self._dirty = True
+        self._ensure_saver()
+
+    def _ensure_saver(self):
+        if not self.path or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="extraction-stats-saver", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(SAVE_INTERVAL_SECONDS)
+            self.flush()
+
+    def flush(self):
+        """Writes the statistics to `path` if anything changed since the last write."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = json.dumps(self._buckets)
+                self._dirty = False
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                with self._lock:
+                    self._dirty = True
+                logging.warning(f"⚠️ Could not save extraction stats to {self.path}: {e}")
+
+    def plan(self, bucket: str, max_attempts: int) -> tuple[str, int]:
+        """Returns (starting mode, attempt limit) for a question in `bucket`."""
+        with self._lock:
+            stats = self._buckets.get(bucket)
+            if not stats or stats["runs"] < MIN_SAMPLES:
+                stats = self._buckets.get(GLOBAL_BUCKET)
+            if not stats or stats["runs"] < MIN_SAMPLES:
+                return FREE_MODE, max_attempts
+            stats = copy.deepcopy(stats)
+
+        if random.random() < EXPLORE_RATE:
+            return FREE_MODE, max_attempts
+
+        free = stats[FREE_MODE]
+        start_mode = FREE_MODE
+        if free["tries"] >= MIN_SAMPLES:
+            if free["hits"] / free["tries"] < FREE_MODE_MIN_SUCCESS:
+                start_mode = SCHEMA_MODE
+
+        if stats["schema_attempts"]:
+            # Allow one schema attempt beyond the slowest recent success
+            needed = max(max(stats["schema_attempts"]), 1) + 1
+            if start_mode == FREE_MODE:
+                needed += 1
+            attempts = min(max_attempts, needed)
+        else:
+            # Nothing in this bucket has ever verified; don't burn the full retry budget
+            attempts = min(max_attempts, 2)
+        return start_mode, attempts
+
+
+def _stats_path() -> str | None:
+    try:
+        return st.secrets.get("EXTRACTION_STATS_PATH") or None
+    except Exception:
+        return None
+
+
+extraction_stats = ExtractionStats(_stats_path())
@@ -1,102 +1,63 @@
 from __future__ import annotations
 
+import gzip
 import logging
+import queue
+import threading
 
-from flask import Flask, jsonify, request
-from graph_cypher_tool import graph_cypher_tool
+import orjson
+from flask import Flask, Response, jsonify, request
+from graph_cypher_chain import stream_query
 from rag_agent import (
-    _extract_cypher_queries,
     _normalize_value,
-    get_schema_str,
-    interpret_question,
-    interpret_question_with_schema,
-    schema_labels,
-    schema_relationships,
-    verify_triples,
+    cache_refresher,
+    extract_triples,
+    generate_query,
+    query_graph,
 )
+from progress import DONE, STAGE_LABELS, ProgressCallback, ProgressEvent
+from result_compaction import to_columnar
+from request_context import RequestContext
+from result_cursor import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorRegistry
+from single_flight import SingleFlight, flight_key
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 app = Flask(__name__)
 
+COLUMNAR_MIMETYPE = "application/vnd.text2cypher.columnar+json"
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
 
-def get_results(question: str) -> dict:
-    # Retry loop for triple extraction
-    MAX_ATTEMPTS = 5
-    attempt = 0
-    verified_triples = []
-    instance_triples = []
-    triples = []
-    rewritten = ""
-
-    while attempt < MAX_ATTEMPTS and not verified_triples:
-        if attempt == 0:
-            rewritten, triples = interpret_question(question, [])
-        else:
-            logging.warning(
-                f"Retry #{attempt}: no valid triples yet — using schema-enforced mode."
-            )
-            schema_str = get_schema_str()
+# Concurrent identical questions share one pipeline run
+question_flights = SingleFlight()
 
-            rewritten, triples = interpret_question_with_schema(
-                question, [], schema_str
-            )
+# Open result streams for paged requests
+result_cursors = CursorRegistry()
 
-        # Fix: preserve instance_triples across retries
-        temp_verified, temp_instance = verify_triples(
-            triples, schema_labels, schema_relationships
-        )
-
-        for t in temp_instance:
-            if t not in instance_triples:
-                instance_triples.append(t)
 
-        if temp_verified:
-            verified_triples = temp_verified
+def _run_pipeline(question: str, on_progress: ProgressCallback = None) -> dict:
+    # Each request gets its own context; the API is stateless, so no history
+    ctx = RequestContext(question=question, on_progress=on_progress)
+    extract_triples(ctx)
+    query_graph(ctx)
 
-        attempt += 1
+    return {
+        "rewritten_question": ctx.rewritten,
+        "cypher_query": ctx.cypher_query,
+        "result": ctx.result if ctx.result else "",
+        "verified_triples": ctx.verified_triples,
+        "instance_triples": ctx.instance_triples,
+        "error": ctx.error,
+    }
 
-    if not verified_triples:
-        if not verified_triples:
-            logging.warning(
-                f"❌ Still no verified triples after {attempt} attempts — using unverified ones: {triples}"
-            )
 
-        verified_triples = triples
-        if not instance_triples:
-            logging.warning("⚠️ No instance triples found — falling back without them.")
-
-    # Send dict payload to tool
-    logging.info(f"💾 FINAL instance_triples passed to LLM: {instance_triples}")
-    tool_output = graph_cypher_tool.invoke(
-        {
-            "question": question,
-            "rewritten": rewritten,
-            "verified_triples": verified_triples,
-            "instance_triples": instance_triples,
-            "history": "",
-        }
-    )
-
-    if isinstance(tool_output, dict):
-        result_payload = tool_output
-        _, decoded_query = _extract_cypher_queries(tool_output)
-    else:
-        result_payload = {"result": tool_output}
-
-    decoded_query = decoded_query or ""
-    result = (
-        _normalize_value(result_payload.get("result"))
-        if result_payload.get("result")
-        else ""
-    )
+def get_results(question: str) -> dict:
+    return question_flights.do(flight_key(question), _run_pipeline, question)
 
-    return {
-        "rewritten_question": rewritten,
-        "cypher_query": decoded_query,
-        "result": result,
-        "verified_triples": verified_triples,
-        "instance_triples": instance_triples,
-        "error": result_payload.get("error"),
-    }
 
 @app.post("/api/text2cypher")
 def text2cypher():
@@ -105,18 +66,159 @@ def text2cypher():
     if not question:
         return jsonify({"error": "question is required"}), 400
 
+    try:
+        page_size = _page_size(
+            payload.get("page_size") or request.args.get("page_size")
+        )
+    except ValueError:
+        return jsonify({"error": "page_size must be an integer"}), 400
+    if page_size:
+        return _paged_response(question, page_size)
+
     results = get_results(question=question)
-    return jsonify(
-        {
-            "input_question": question,
-            "cypher_query": results.get("cypher_query"),
-            "result": results.get("result"),
-            "verified_triples": results.get("verified_triples"),
-            "instance_triples": results.get("instance_triples"),
-            "error": results.get("error"),
-        }
-    )
+    body = {
+        "input_question": question,
+        "cypher_query": results.get("cypher_query"),
+        "result": results.get("result"),
+        "verified_triples": results.get("verified_triples"),
+        "instance_triples": results.get("instance_triples"),
+        "error": results.get("error"),
+    }
+    if _wants_columnar():
+        return _columnar_response(body)
+    return jsonify(body)
+
+
+@app.post("/api/text2cypher/stream")
+def text2cypher_stream():
+    """Same as /api/text2cypher, streamed as NDJSON progress events.
+
+    Each line is a ProgressEvent; the last line has stage "done" and carries
+    the usual response body in `data` (or stage "error" with the message).
+    """
+    payload = request.get_json(silent=True) or {}
+    question = (payload.get("question") or "").strip()
+    if not question:
+        return jsonify({"error": "question is required"}), 400
+
+    events = queue.Queue()
+
+    def run():
+        try:
+            body = question_flights.do(
+                flight_key(question), _run_pipeline, question, events.put
+            )
+            body = {"input_question": question, **body}
+            events.put(ProgressEvent(DONE, STAGE_LABELS[DONE], body))
+        except Exception as e:
+            logging.warning(f"Handled exception streaming pipeline: {e}")
+            events.put(ProgressEvent("error", str(e)))
+        events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    def generate():
+        while (event := events.get()) is not None:
+            yield orjson.dumps(event.as_dict(), default=str) + b"\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.get("/api/cache/status")
+def cache_status():
+    """Schema/lexicon refresh metrics: durations, counts and staleness."""
+    return jsonify(cache_refresher.stats())
+
+
+def _page_size(value) -> int | None:
+    """Parses a page_size argument; raises ValueError unless it is an integer."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        # JSON floats like 1.5 would silently truncate
+        raise ValueError(value)
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def _paged_response(question: str, page_size: int):
+    # Generate the query, then stream its records instead of materializing them
+    ctx = RequestContext(question=question)
+    extract_triples(ctx)
+    error = None
+    page, token = [], None
+    try:
+        generate_query(ctx)
+        if ctx.cypher_query:
+            page, token = result_cursors.open(
+                stream_query(ctx.cypher_query, page_size), page_size
+            )
+    except Exception as e:
+        logging.warning(f"Handled exception running paged query: {e}")
+        error = str(e)
+
+    body = {
+        "input_question": question,
+        "cypher_query": ctx.cypher_query,
+        "result": _normalize_value(page),
+        "next_token": token,
+        "verified_triples": ctx.verified_triples,
+        "instance_triples": ctx.instance_triples,
+        "error": error,
+    }
+    if _wants_columnar():
+        return _columnar_response(body)
+    return jsonify(body)
+
+
+@app.get("/api/text2cypher/page")
+def text2cypher_page():
+    token = request.args.get("token", "")
+    try:
+        page_size = _page_size(request.args.get("page_size")) or DEFAULT_PAGE_SIZE
+    except ValueError:
+        return jsonify({"error": "page_size must be an integer"}), 400
+    try:
+        page, next_token = result_cursors.next_page(token, page_size)
+    except KeyError:
+        return jsonify({"error": "unknown or expired token"}), 404
+
+    body = {"result": _normalize_value(page), "next_token": next_token, "error": None}
+    if _wants_columnar():
+        return _columnar_response(body)
+    return jsonify(body)
+
+
+def _wants_columnar() -> bool:
+    # Opt in with ?format=columnar or an Accept header naming the columnar type
+    if request.args.get("format", "").lower() == "columnar":
+        return True
+    return COLUMNAR_MIMETYPE in request.headers.get("Accept", "")
+
+
+def _columnar_response(body: dict) -> Response:
+    """Encodes `body` with orjson, returning `result` as {columns, rows}.
+
+    The payload is compressed with zstd or gzip when the client accepts it.
+    """
+    result = body["result"]
+    if isinstance(result, list) and all(isinstance(row, dict) for row in result):
+        columns, rows = to_columnar(result)
+        body = {**body, "result": {"columns": columns, "rows": rows}}
+
+    data = orjson.dumps(body, default=str, option=orjson.OPT_NON_STR_KEYS)
+    response = Response(data, mimetype=COLUMNAR_MIMETYPE)
+    response.vary.update(["Accept", "Accept-Encoding"])
+
+    if len(data) >= MIN_COMPRESS_BYTES:
+        accepted = request.accept_encodings
+        if zstandard is not None and accepted["zstd"]:
+            response.set_data(zstandard.ZstdCompressor(level=3).compress(data))
+            response.headers["Content-Encoding"] = "zstd"
+        elif accepted["gzip"]:
+            response.set_data(gzip.compress(data, compresslevel=5))
+            response.headers["Content-Encoding"] = "gzip"
+    return response
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=8000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,91 @@
+# Approximate name lookup: a character trigram inverted index generates candidates,
+# bounded Levenshtein distance ranks them
+
+import re
+from collections import Counter, defaultdict
+
+_SEPARATORS_RE = re.compile(r"[\W_]+")
+
+
+def normalize_name(text: str) -> str:
+    """Lowercases and drops separators, so "HadGEM3 GC31 LL" == "HadGEM3-GC31-LL"."""
+    return _SEPARATORS_RE.sub("", str(text).lower())
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"${key}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int | None:
+    """Returns the edit distance between `a` and `b`, or None if it exceeds `max_distance`."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+class ApproximateMatcher:
+    """Finds the names closest to a query within an edit-distance bound.
+
+    Names are compared in normalized form. By the q-gram lemma, a key within
+    distance k of the query shares at least |grams(query)| - 3k trigrams with
+    it, so only keys reaching that overlap are scored.
+    """
+
+    def __init__(self, names):
+        self._names: dict[str, list[str]] = defaultdict(list)
+        for name in names:
+            key = normalize_name(name)
+            if key and name not in self._names[key]:
+                self._names[key].append(name)
+        self._keys = list(self._names)
+        postings = defaultdict(list)
+        for key_id, key in enumerate(self._keys):
+            for gram in _trigrams(key):
+                postings[gram].append(key_id)
+        self._postings = dict(postings)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def exact(self, query: str) -> list[str]:
+        return list(self._names.get(normalize_name(query), []))
+
+    def lookup(
+        self, query: str, max_distance: int, limit: int = 5
+    ) -> list[tuple[int, str]]:
+        """Returns up to `limit` (distance, name) pairs, closest first."""
+        key = normalize_name(query)
+        if not key:
+            return []
+        grams = _trigrams(key)
+        min_overlap = max(len(grams) - 3 * max_distance, 1)
+
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self._postings.get(gram, ()))
+
+        matches = []
+        for key_id, shared in overlap.items():
+            if shared < min_overlap:
+                continue
+            candidate = self._keys[key_id]
+            distance = bounded_levenshtein(key, candidate, max_distance)
+            if distance is not None:
+                matches.extend((distance, name) for name in self._names[candidate])
+        matches.sort()
+        return matches[:limit]
@@ -0,0 +1,218 @@
+# Compact in-memory gazetteer for the geographic labels, with exact, prefix and phrase lookup
+
+import bisect
+import logging
+import sys
+import time
+from array import array
+
+from fuzzy_matcher import normalize_name
+
+# Geographic labels in ambiguity order: "Florida" is the subdivision before the town
+GEO_LABELS = [
+    "Country",
+    "Country_Subdivision",
+    "Continent",
+    "Water_Bodies",
+    "No_Country_Region",
+    "City",
+]
+
+# Properties holding a single name or code vs a comma-joined alias list
+GEO_NAME_PROPERTIES = ["name", "Name", "asciiname", "iso", "iso3", "fips", "code"]
+GEO_ALIAS_PROPERTIES = ["alternatenames"]
+
+# Longest phrase (in words) tried when scanning free text like "over Florida, USA"
+MAX_PHRASE_WORDS = 5
+
+# Below this length a phrase must be written in capitals to count as a code
+# ("USA", "FL"), so words like "in" or "over" are not read as places
+MIN_LOWERCASE_LENGTH = 4
+# Words that may surround place names without being part of them
+PLACE_STOPWORDS = {"over", "in", "of", "the", "near", "around", "across", "and", "at"}
+
+
+def _key(text: str) -> bytes:
+    # UTF-8 bytes sort in code point order, so bytes keys keep the str ordering
+    return normalize_name(text).encode("utf-8")
+
+
+class _SortedKeys:
+    """Read-only sequence view over keys packed into one bytes blob, for bisect."""
+
+    def __init__(self, blob: bytes, offsets: array):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.blob[self.offsets[i] : self.offsets[i + 1]]
+
+
+class Gazetteer:
+    """Alias → node lookup for geographic labels.
+
+    Nodes are stored column-wise (interned name, label code, element id).
+    Normalized alias keys are sorted and packed into a single bytes blob with an
+    offsets array, and a parallel array maps each key to its node, so the
+    whole structure is a few flat arrays rather than millions of objects.
+    """
+
+    def __init__(self, labels: list[str]):
+        self.labels = labels
+        self.node_names: list[str] = []
+        self.node_ids: list[str] = []
+        self.node_labels = array("B")
+        self._pending: list[tuple[bytes, int]] = []
+        self._keys = _SortedKeys(b"", array("I", [0]))
+        self._key_nodes = array("I")
+
+    def add_node(self, label: str, node_id: str, name: str, aliases):
+        node = len(self.node_names)
+        self.node_names.append(sys.intern(str(name)))
+        self.node_ids.append(node_id)
+        self.node_labels.append(self.labels.index(label))
+        keys = {_key(name)} | {_key(alias) for alias in aliases}
+        self._pending.extend((key, node) for key in keys if key)
+
+    def freeze(self):
+        """Sorts and packs the keys added so far; call once after loading."""
+        entries = sorted(set(self._pending))
+        self._pending = []
+        offsets = array("I", [0])
+        for key, _ in entries:
+            offsets.append(offsets[-1] + len(key))
+        self._keys = _SortedKeys(b"".join(key for key, _ in entries), offsets)
+        self._key_nodes = array("I", (node for _, node in entries))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _node(self, node: int) -> tuple[str, str, str]:
+        label = self.labels[self.node_labels[node]]
+        return label, self.node_names[node], self.node_ids[node]
+
+    def _ranked(self, nodes) -> list[tuple[str, str, str]]:
+        # Dedupe, then order by label priority
+        unique = sorted(set(nodes), key=lambda n: (self.node_labels[n], n))
+        return [self._node(node) for node in unique]
+
+    def exact(self, text: str, labels=None) -> list[tuple[str, str, str]]:
+        """Returns (label, name, node id) for nodes with an alias equal to `text`."""
+        key = _key(text)
+        if not key:
+            return []
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_right(self._keys, key, lo=start)
+        found = self._ranked(self._key_nodes[start:end])
+        return [m for m in found if labels is None or m[0] in labels]
+
+    def prefix(
+        self, text: str, limit: int = 10, labels=None
+    ) -> list[tuple[str, str, str]]:
+        """Returns up to `limit` nodes with an alias starting with `text`."""
+        key = _key(text)
+        if not key:
+            return []
+        start = bisect.bisect_left(self._keys, key)
+        nodes = []
+        for i in range(start, len(self._keys)):
+            if not self._keys[i].startswith(key):
+                break
+            nodes.append(self._key_nodes[i])
+            if len(nodes) >= limit * 4:
+                break
+        found = self._ranked(nodes)
+        return [m for m in found if labels is None or m[0] in labels][:limit]
+
+    def is_code(self, text: str) -> bool:
+        return len(text) >= MIN_LOWERCASE_LENGTH or text.isupper()
+
+    def find_places(
+        self, text: str, labels=None, full_cover: bool = False
+    ) -> list[tuple[str, str, str, str]]:
+        """Scans free text for place names, longest phrase first.
+
+        "over Florida, USA" → [("Florida", Country_Subdivision, ...),
+        ("USA", Country, ...)]; returns (phrase, label, name, node id). With
+        `full_cover`, nothing is returned unless every word other than commas
+        and PLACE_STOPWORDS is part of a place.
+        """
+        words = text.replace(",", " , ").split()
+        places = []
+        i = 0
+        while i < len(words):
+            for size in range(min(MAX_PHRASE_WORDS, len(words) - i), 0, -1):
+                phrase = " ".join(words[i : i + size])
+                if "," in words[i : i + size]:
+                    continue
+                if not self.is_code(phrase):
+                    continue
+                # "over" alone, or "near Paris", is not itself a place; the
+                # words after the stopword are tried on the next position
+                if words[i].lower() in PLACE_STOPWORDS:
+                    continue
+                found = self.exact(phrase, labels)
+                if found:
+                    places.append((phrase, *found[0]))
+                    i += size
+                    break
+            else:
+                filler = words[i] == "," or words[i].lower() in PLACE_STOPWORDS
+                if full_cover and not filler:
+                    return []
+                i += 1
+        return places
+
+
+def load_gazetteer(graph, labels=None) -> Gazetteer:
+    """Builds the gazetteer from the geographic labels present in the graph."""
+    start = time.perf_counter()
+    gazetteer = Gazetteer(GEO_LABELS)
+    properties = GEO_NAME_PROPERTIES + GEO_ALIAS_PROPERTIES
+    columns = ", ".join(f"n.`{prop}` AS `{prop}`" for prop in properties)
+    for label in GEO_LABELS:
+        if labels is not None and label not in labels:
+            continue
+        try:
+            rows = graph.query(
+                f"MATCH (n:`{label}`) RETURN elementId(n) AS id, {columns}", {}
+            )
+        except Exception as e:
+            logging.warning(f"⚠️ Could not load gazetteer entries for {label}: {e}")
+            continue
+        for row in rows:
+            names = [
+                row[prop]
+                for prop in GEO_NAME_PROPERTIES
+                if row.get(prop) not in (None, "")
+            ]
+            if not names:
+                continue
+            aliases = [str(n) for n in names[1:]]
+            for prop in GEO_ALIAS_PROPERTIES:
+                if row.get(prop):
+                    aliases.extend(a.strip() for a in str(row[prop]).split(","))
+            gazetteer.add_node(label, row["id"], names[0], aliases)
+    gazetteer.freeze()
+    logging.info(
+        f"🌍 Built gazetteer: {len(gazetteer.node_names)} places, "
+        f"{len(gazetteer)} aliases in {time.perf_counter() - start:.1f}s"
+    )
+    return gazetteer
+
+
+# Built and refreshed in the background (see cache_refresher)
+_gazetteer = None
+
+
+def get_gazetteer() -> Gazetteer | None:
+    """Returns the current gazetteer, or None while it is first being built."""
+    return _gazetteer
+
+
+def set_gazetteer(gazetteer: Gazetteer):
+    global _gazetteer
+    _gazetteer = gazetteer
@@ -1,3 +1,4 @@
+import functools
 import json
 import logging
 import re
@@ -5,52 +6,125 @@ import urllib.parse
 
 import streamlit as st
 from langchain.chains import GraphCypherQAChain
-from langchain.chains.conversation.memory import ConversationBufferMemory
 from langchain.prompts.prompt import PromptTemplate
-from langchain_openai import ChatOpenAI
+from langchain_community.chains.graph_qa.cypher import extract_cypher
 from langchain_community.graphs import Neo4jGraph
+from langchain_community.graphs.graph_document import GraphDocument
+from langchain_community.graphs.graph_store import GraphStore
+from langchain_community.graphs.neo4j_graph import _format_schema, value_sanitize
 from datetime import datetime, date, time
 from retry import retry
 
+from cassette import REPLAY, ReplayGraph, get_cassette
+from cypher_params import parameterize_cypher
+from llm_clients import MAX_CACHED_KEYS, get_llm
+from normalize_properties import strip_shadow_properties
+from result_cursor import stream_records
+from token_budget import PromptSection, fit_sections
 from templates.cypher_climate_template import CYPHER_GENERATION_CLIMATE_TEMPLATE
 
 CYPHER_GENERATION_PROMPT = PromptTemplate(
     input_variables=["schema", "question"], template=CYPHER_GENERATION_CLIMATE_TEMPLATE
 )
 
-MEMORY = ConversationBufferMemory(
-    memory_key="chat_history",
-    input_key="question",
-    output_key="answer",
-    return_messages=True,
-)
-
 url = st.secrets["NEO4J_URI"]
 username = st.secrets["NEO4J_USERNAME"]
 password = st.secrets["NEO4J_PASSWORD"]
 
-graph = Neo4jGraph(url=url, username=username, password=password, sanitize=True)
-
-graph_chain = GraphCypherQAChain.from_llm(
-    cypher_llm=ChatOpenAI(
-        api_key=st.secrets["OPENAI_API_KEY"],
-        temperature=0.3,
-        model="gpt-4o-mini",
-    ),
-    qa_llm=ChatOpenAI(
-        api_key=st.secrets["OPENAI_API_KEY"],
-        temperature=0.7,
-        model="gpt-4o-mini",
-    ),
-    graph=graph,
-    cypher_prompt=CYPHER_GENERATION_PROMPT,
-    validate_cypher=True,
-    return_direct=True,
-    verbose=True,
-    allow_dangerous_requests=True,
-    return_intermediate_steps=True,
-    top_k=100,
-)
+
+class ParameterizedNeo4jGraph(Neo4jGraph):
+    """Neo4jGraph that can lift inline literals into parameters before execution.
+
+    Only LLM-generated Cypher asks for it (see GeneratedCypherGraph), so
+    identical query shapes share one cached plan; the app's own maintenance
+    queries run exactly as written.
+    """
+
+    def query(
+        self, query: str, params: dict = None, parameterize: bool = False, **kwargs
+    ):
+        request = {"query": query, "params": params or {}}
+        if parameterize and not params:
+            query, params = parameterize_cypher(query)
+            logging.info(f"🧩 Parameterized Cypher: {query} | params={params}")
+        result = super().query(query, params or {}, **kwargs)
+        if cassette:
+            cassette.record("graph", request, result)
+        return result
+
+    def refresh_schema(self):
+        super().refresh_schema()
+        # The __norm_* lookup copies are not part of the model-facing schema
+        strip_shadow_properties(self.structured_schema)
+        self.schema = _format_schema(self.structured_schema, self._enhanced_schema)
+        if cassette:
+            cassette.record(
+                "schema",
+                {},
+                {"schema": self.schema, "structured_schema": self.structured_schema},
+            )
+
+
+class GeneratedCypherGraph(GraphStore):
+    """The graph as the chain sees it: its queries are LLM-generated Cypher.
+
+    Everything else is delegated to the wrapped graph.
+    """
+
+    def __init__(self, graph: GraphStore):
+        self.graph = graph
+
+    @property
+    def get_schema(self) -> str:
+        return self.graph.get_schema
+
+    @property
+    def get_structured_schema(self) -> dict:
+        return self.graph.get_structured_schema
+
+    @property
+    def structured_schema(self) -> dict:
+        return self.graph.structured_schema
+
+    def query(self, query: str, params: dict = {}) -> list[dict]:
+        if isinstance(self.graph, ParameterizedNeo4jGraph):
+            return self.graph.query(query, params, parameterize=True)
+        return self.graph.query(query, params)
+
+    def refresh_schema(self):
+        self.graph.refresh_schema()
+
+    def add_graph_documents(
+        self, graph_documents: list[GraphDocument], include_source: bool = False
+    ):
+        raise NotImplementedError("Generated Cypher runs read-only")
+
+
+# In replay mode the graph is served from the cassette, with no connection
+cassette = get_cassette()
+if cassette and cassette.mode == REPLAY:
+    graph = ReplayGraph(cassette)
+else:
+    graph = ParameterizedNeo4jGraph(
+        url=url, username=username, password=password, sanitize=True
+    )
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_KEYS)
+def get_graph_chain(api_key: str = None) -> GraphCypherQAChain:
+    """Returns the GraphCypherQAChain for `api_key`, cached per key."""
+    return GraphCypherQAChain.from_llm(
+        cypher_llm=get_llm("cypher", api_key),
+        qa_llm=get_llm("qa", api_key),
+        graph=GeneratedCypherGraph(graph),
+        cypher_prompt=CYPHER_GENERATION_PROMPT,
+        validate_cypher=True,
+        return_direct=True,
+        verbose=True,
+        allow_dangerous_requests=True,
+        return_intermediate_steps=True,
+        top_k=100,
+    )
 
 
 def parse_schema(schema_text: str):
@@ -69,18 +143,14 @@ def parse_schema(schema_text: str):
     return labels, relationships
 
 
-@retry(tries=2, delay=12)
-def get_results(
+def build_question_block(
     question: str,
     rewritten: str = "",
     verified_triples: list[tuple[str, str, str]] = None,
     instance_triples: list[tuple[str, str, str]] = None,
     history: str = "",
 ) -> str:
-
-    logging.info(f"Using Neo4j database at URL: {url}")
-
-    verified_triples = verified_triples or []
+    """Builds the text that fills the Cypher template's {question} slot."""
     triples_text = (
         "\n".join([f"({s}, {r}, {o})" for (s, r, o) in verified_triples or []])
         or "None"
@@ -90,29 +160,109 @@ def get_results(
         or "None"
     )
 
-    graph.refresh_schema()
-
-    print("\n========= Raw Schema from Neo4j =========\n")
-    print(graph.get_schema)
+    # Fit the prompt into the cypher budget: the template and schema are fixed,
+    # conversation history goes first, then instance triples, then verified triples
+    sections = fit_sections(
+        "cypher",
+        [
+            PromptSection(
+                "template", CYPHER_GENERATION_CLIMATE_TEMPLATE, trimmable=False
+            ),
+            PromptSection("schema", graph.get_schema, trimmable=False),
+            PromptSection("history", history or "None", priority=0),
+            PromptSection("question", question, trimmable=False),
+            PromptSection("rewritten", rewritten or question, priority=3),
+            PromptSection("verified_triples", triples_text, priority=2),
+            PromptSection("instance_triples", instance_text, priority=1),
+        ],
+    )
 
-    conversation_history = history or "None"
-    question_block = f"""
+    return f"""
 Conversation History:
-{conversation_history}
+{sections["history"] or "None"}
 
 Now generate a Cypher query for:
 {question}
 
 Rewritten Question:
-{rewritten or question}
+{sections["rewritten"]}
 
 Verified Triples:
-{triples_text}
+{sections["verified_triples"] or "None"}
 
 Instance Triples:
-{instance_text}
+{sections["instance_triples"] or "None"}
 """.strip()
 
+
+def generate_cypher(
+    question: str,
+    rewritten: str = "",
+    verified_triples: list[tuple[str, str, str]] = None,
+    instance_triples: list[tuple[str, str, str]] = None,
+    history: str = "",
+    api_key: str = None,
+) -> str:
+    """Generates (and validates) the Cypher query for a question without running it."""
+    chain = get_graph_chain(api_key)
+    question_block = build_question_block(
+        question, rewritten, verified_triples, instance_triples, history
+    )
+    generated = chain.cypher_generation_chain.invoke(
+        {"question": question_block, "schema": chain.graph_schema}
+    )[chain.cypher_generation_chain.output_key]
+    generated = extract_cypher(generated)
+    if chain.cypher_query_corrector:
+        generated = chain.cypher_query_corrector(generated)
+    query = re.sub(r"^\s*cypher\s+", "", generated, flags=re.IGNORECASE).strip()
+    print("\n========= Generated Cypher =========\n")
+    print(query)
+    return query
+
+
+def stream_query(query: str, fetch_size: int):
+    """Runs `query` in its own session and yields rows as they are fetched.
+
+    With a cassette recording, the rows are also recorded under the same key
+    graph.query() uses, once the stream is exhausted, so replays can page them.
+    """
+    if isinstance(graph, ReplayGraph):
+        yield from graph.query(query)
+        return
+    normalized_query, params = parameterize_cypher(query)
+    recorded = [] if cassette else None
+    for row in stream_records(
+        graph._driver, graph._database, normalized_query, params, fetch_size
+    ):
+        row = value_sanitize(row) if graph.sanitize else row
+        if recorded is not None:
+            recorded.append(row)
+        yield row
+    if recorded is not None:
+        # Streams closed early are not recorded, since they would replay truncated
+        cassette.record("graph", {"query": query, "params": {}}, recorded)
+
+
+@retry(tries=2, delay=12)
+def get_results(
+    question: str,
+    rewritten: str = "",
+    verified_triples: list[tuple[str, str, str]] = None,
+    instance_triples: list[tuple[str, str, str]] = None,
+    history: str = "",
+    api_key: str = None,
+) -> str:
+
+    logging.info(f"Using Neo4j database at URL: {url}")
+
+    # The schema is kept current by the background cache refresher
+    print("\n========= Raw Schema from Neo4j =========\n")
+    print(graph.get_schema)
+
+    question_block = build_question_block(
+        question, rewritten, verified_triples, instance_triples, history
+    )
+
     prompt = CYPHER_GENERATION_PROMPT.format(
         schema=graph.get_schema,
         question=question_block,
@@ -122,8 +272,10 @@ Instance Triples:
     print(prompt)
 
     try:
-        chain_result = graph_chain.invoke(
-            {"query": question},
+        # The chain fills the template's {question} slot, so send the full
+        # block (history, rewritten question, triples) rather than the bare question
+        chain_result = get_graph_chain(api_key).invoke(
+            {"query": question_block},
             return_only_outputs=True,
         )
     except Exception as e:
@@ -143,8 +295,13 @@ Instance Triples:
             query = query_raw.replace("cypher", "", 1).strip()
             print("\n========= Generated Cypher =========\n")
             print(query)
+            # Keep the literal text for the Neo4j Browser link; the normalized
+            # form identifies the query shape and can be used as a cache key.
+            normalized_query, query_params = parameterize_cypher(query)
             encoded_query = urllib.parse.quote(query)
             chain_result["intermediate_steps"][-1]["query"] = encoded_query
+            chain_result["intermediate_steps"][-1]["normalized_query"] = normalized_query
+            chain_result["intermediate_steps"][-1]["params"] = query_params
     except Exception as e:
         logging.warning(f"Failed to extract Cypher query: {e}")
 
@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 from langchain.tools import tool
 from graph_cypher_chain import get_results
@@ -10,6 +10,8 @@ class GraphToolInput(BaseModel):
     verified_triples: List[Tuple[str, str, str]]
     instance_triples: List[Tuple[str, str, str]]
     history: str
+    # Caller's OpenAI key; None uses the app key
+    api_key: Optional[str] = None
 
 
 @tool("graph-cypher-tool", args_schema=GraphToolInput)
@@ -19,6 +21,7 @@ def graph_cypher_tool(
     verified_triples: List[Tuple[str, str, str]],
     instance_triples: List[Tuple[str, str, str]],
     history: str,
+    api_key: Optional[str] = None,
 ) -> str:
     """
     Converts natural language questions into Cypher queries using schema-based and instance-based semantic triples.
@@ -36,4 +39,5 @@ def graph_cypher_tool(
         verified_triples=verified_triples,
         instance_triples=instance_triples,
         history=history,
+        api_key=api_key,
     )
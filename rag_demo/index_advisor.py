@@ -0,0 +1,213 @@
+# Reports which entity-lookup properties lack an index, estimates what each gap costs,
+# and prints (or applies) the CREATE INDEX statements that close them.
+#
+#   python rag_demo/index_advisor.py                 # climate map, report only
+#   python rag_demo/index_advisor.py --map all       # every match_*_properties_map
+#   python rag_demo/index_advisor.py --apply         # also create the indexes
+
+import argparse
+import sys
+
+import streamlit as st
+from neo4j import GraphDatabase
+from property_metadata import EntityProperties, SessionGraph
+from templates import match_properties_map
+
+# Index types that can serve an equality lookup on a single property
+SEEKABLE_INDEX_TYPES = {"RANGE", "TEXT", "FULLTEXT"}
+# Only ONLINE indexes serve lookups; POPULATING ones will once built, FAILED
+# ones never will and must be dropped before an equivalent can be created
+ONLINE = "ONLINE"
+POPULATING = "POPULATING"
+
+
+def properties_maps() -> dict[str, dict[str, list[str]]]:
+    """Returns every match_<name>_properties_map keyed by <name>."""
+    return {
+        name[len("match_") : -len("_properties_map")]: value
+        for name, value in vars(match_properties_map).items()
+        if name.startswith("match_") and name.endswith("_properties_map")
+    }
+
+
+def indexed_properties(session) -> dict[tuple[str, str], list[dict]]:
+    """Maps (label, property) to the {name, type, state} of each index listing it.
+
+    Every state is returned; callers decide which ones count as coverage.
+    """
+    covered = {}
+    rows = session.run(
+        "SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties, state "
+        "WHERE entityType = 'NODE' RETURN name, type, labelsOrTypes, properties, state"
+    )
+    for row in rows:
+        if row["type"] not in SEEKABLE_INDEX_TYPES or not row["properties"]:
+            continue
+        if row["type"] == "FULLTEXT":
+            # A full-text index covers every label × property it lists
+            pairs = [(l, p) for l in row["labelsOrTypes"] for p in row["properties"]]
+        else:
+            # Composite indexes are only counted for their leading property
+            pairs = [(row["labelsOrTypes"][0], row["properties"][0])]
+        index = {"name": row["name"], "type": row["type"], "state": row["state"]}
+        for pair in pairs:
+            covered.setdefault(pair, []).append(index)
+    return covered
+
+
+def _describe(indexes: list[dict]) -> list[str]:
+    return [f"{index['type']} ({index['state']})" for index in indexes]
+
+
+def label_counts(session, labels) -> dict[str, int]:
+    existing = {row["label"] for row in session.run("CALL db.labels() YIELD label")}
+    counts = {}
+    for label in labels:
+        if label in existing:
+            counts[label] = session.run(
+                f"MATCH (n:`{label}`) RETURN count(n) AS count"
+            ).single()["count"]
+    return counts
+
+
+def index_statement(label: str, prop: str, index_type: str) -> str:
+    name = f"entity_{label}_{prop}".lower()
+    kind = "TEXT INDEX" if index_type == "text" else "INDEX"
+    return (
+        f"CREATE {kind} {name} IF NOT EXISTS "
+        f"FOR (n:`{label}`) ON (n.`{prop}`)"
+    )
+
+
+def advise(
+    session, properties_map: dict[str, list[str]], index_type: str
+) -> list[dict]:
+    """Returns one row per lookup (label, property) with coverage and cost.
+
+    Properties entity matching skips (embeddings, numbers, long text) are left out.
+    """
+    covered = indexed_properties(session)
+    counts = label_counts(session, properties_map)
+    entity_properties = EntityProperties.build(
+        SessionGraph(session), properties_map, counts
+    )
+    rows = []
+    for label in properties_map:
+        if label not in counts:
+            continue
+        for prop in entity_properties.matchable(label):
+            listed = covered.get((label, prop), [])
+            online = [i for i in listed if i["state"] == ONLINE]
+            populating = [i for i in listed if i["state"] == POPULATING]
+            failed = [i for i in listed if i["state"] not in (ONLINE, POPULATING)]
+            # A populating index will cover the property once built
+            needed = not online and not populating
+            rows.append(
+                {
+                    "label": label,
+                    "property": prop,
+                    "nodes": counts[label],
+                    "indexes": _describe(online),
+                    "unavailable": _describe(populating + failed),
+                    # Without an online index each lookup scans every node
+                    "rows_per_lookup": 1 if online else counts[label],
+                    "drops": [f"DROP INDEX `{i['name']}` IF EXISTS" for i in failed]
+                    if needed
+                    else [],
+                    "statement": index_statement(label, prop, index_type)
+                    if needed
+                    else None,
+                }
+            )
+    return rows
+
+
+def print_report(rows: list[dict]):
+    missing = [row for row in rows if not row["indexes"]]
+    width = max((len(f"{r['label']}.{r['property']}") for r in rows), default=0)
+    width = max(width, len("label.property"))
+    print(f"{'label.property':<{width}}  {'nodes':>10}  {'rows/lookup':>11}  index")
+    for row in sorted(rows, key=lambda r: -r["rows_per_lookup"]):
+        name = f"{row['label']}.{row['property']}"
+        indexes = ", ".join(row["indexes"] or ["MISSING"] + row["unavailable"])
+        print(
+            f"{name:<{width}}  {row['nodes']:>10,}  "
+            f"{row['rows_per_lookup']:>11,}  {indexes}"
+        )
+
+    scanned = sum(row["rows_per_lookup"] for row in missing)
+    print(
+        f"\n{len(missing)} of {len(rows)} lookup properties have no online index; "
+        f"a literal tried against all of them scans ~{scanned:,} nodes."
+    )
+    print(
+        "Note: lookups that wrap the property in toLower()/toString() cannot use "
+        "these indexes; run normalize_properties.py to match on indexed "
+        "__norm_* copies instead."
+    )
+    unavailable = [row for row in rows if row["unavailable"]]
+    if unavailable:
+        print("\nIndexes that are not online (not counted as coverage):")
+        for row in unavailable:
+            print(
+                f"  {row['label']}.{row['property']}: {', '.join(row['unavailable'])}"
+            )
+    suggested = [row for row in rows if row["statement"]]
+    if suggested:
+        print("\nSuggested statements:")
+        for row in suggested:
+            for drop in row["drops"]:
+                print(f"{drop};")
+            print(f"{row['statement']};")
+
+
+def main(argv=None) -> int:
+    maps = properties_maps()
+    parser = argparse.ArgumentParser(
+        description="Report entity-lookup properties without an index."
+    )
+    parser.add_argument(
+        "--map",
+        default="climate",
+        choices=sorted(maps) + ["all"],
+        help="which match_*_properties_map to check (default: climate)",
+    )
+    parser.add_argument(
+        "--type",
+        default="range",
+        choices=["range", "text"],
+        help="index type to suggest (default: range)",
+    )
+    parser.add_argument(
+        "--apply", action="store_true", help="create the missing indexes"
+    )
+    parser.add_argument("--uri", default=None, help="defaults to NEO4J_URI in secrets")
+    args = parser.parse_args(argv)
+
+    if args.map == "all":
+        properties_map = {}
+        for value in maps.values():
+            for label, props in value.items():
+                merged = properties_map.setdefault(label, [])
+                merged.extend(p for p in props if p not in merged)
+    else:
+        properties_map = maps[args.map]
+
+    driver = GraphDatabase.driver(
+        args.uri or st.secrets["NEO4J_URI"],
+        auth=(st.secrets["NEO4J_USERNAME"], st.secrets["NEO4J_PASSWORD"]),
+    )
+    with driver, driver.session() as session:
+        rows = advise(session, properties_map, args.type)
+        print_report(rows)
+        if args.apply:
+            for row in rows:
+                if row["statement"]:
+                    for statement in row["drops"] + [row["statement"]]:
+                        session.run(statement).consume()
+                        print(f"✅ {statement}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
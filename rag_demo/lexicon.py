@@ -0,0 +1,175 @@
+# In-memory entity vocabulary per label, for resolving literals without a database round trip
+
+import logging
+import time
+
+import streamlit as st
+from fuzzy_matcher import ApproximateMatcher, normalize_name
+from tfidf_linker import TfidfLinker
+
+# Comma-joined alias blobs: split into single aliases, and too large for the
+# edit-distance index, so they are only linked through TF-IDF
+ALIAS_PROPERTIES = {"alternatenames"}
+
+# Edit distance allowed per normalized character, and its cap
+DEFAULT_DISTANCE_RATIO = 0.2
+MAX_DISTANCE = 3
+# Short names (e.g. variable ids like "tas", "pr") only match exactly
+MIN_FUZZY_LENGTH = 4
+# Minimum TF-IDF cosine similarity for a linked name
+DEFAULT_LINK_MIN_SCORE = 0.75
+
+
+def load_label_names(
+    graph, label: str, properties: list[str]
+) -> tuple[list[str], list[str]]:
+    """Returns the distinct (names, aliases) of `label` nodes, lists flattened.
+
+    Aliases are the split values of ALIAS_PROPERTIES.
+    """
+    names = set()
+    aliases = set()
+    for prop in properties:
+        try:
+            rows = graph.query(
+                f"MATCH (n:`{label}`) WHERE n.`{prop}` IS NOT NULL "
+                f"RETURN DISTINCT n.`{prop}` AS value",
+                {},
+            )
+        except Exception as e:
+            logging.warning(f"⚠️ Could not load {label}.{prop} names: {e}")
+            continue
+        for row in rows:
+            # Missing when the sanitized graph dropped a long (embedding) list
+            value = row.get("value")
+            for item in value if isinstance(value, list) else [value]:
+                if item in (None, ""):
+                    continue
+                if prop in ALIAS_PROPERTIES:
+                    aliases.update(a.strip() for a in str(item).split(",") if a.strip())
+                else:
+                    names.add(str(item))
+    return sorted(names), sorted(aliases - names)
+
+
+def _per_label_secret(key: str) -> dict:
+    # e.g. [FUZZY_MAX_DISTANCE] Variable = 1
+    try:
+        return dict(st.secrets.get(key, {}))
+    except Exception:
+        return {}
+
+
+def build_label_slice(
+    graph, label: str, properties: list[str]
+) -> tuple[ApproximateMatcher, TfidfLinker]:
+    names, aliases = load_label_names(graph, label, properties)
+    return ApproximateMatcher(names), TfidfLinker(names + aliases)
+
+
+class EntityLexicon:
+    """Approximate matchers and TF-IDF linkers for the names of each schema label.
+
+    `slices` maps each label to its (matcher, linker) pair.
+    """
+
+    def __init__(
+        self, slices: dict[str, tuple[ApproximateMatcher, TfidfLinker]] = None
+    ):
+        self.slices = slices or {}
+        self.max_distances = _per_label_secret("FUZZY_MAX_DISTANCE")
+        self.min_scores = _per_label_secret("LINK_MIN_SCORE")
+
+    @classmethod
+    def build(
+        cls, graph, properties_map: dict[str, list[str]], labels
+    ) -> "EntityLexicon":
+        start = time.perf_counter()
+        slices = {}
+        for label in labels:
+            if label in properties_map:
+                slices[label] = build_label_slice(graph, label, properties_map[label])
+        size = sum(len(linker) for _, linker in slices.values())
+        logging.info(
+            f"📚 Built entity lexicon: {len(slices)} labels, {size} names "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return cls(slices)
+
+    def replace_label(
+        self, label: str, matcher: ApproximateMatcher, linker: TfidfLinker
+    ):
+        """Swaps in a rebuilt slice for `label`.
+
+        Matcher and linker live in one dict that is replaced whole in a single
+        assignment, so concurrent readers see either the old or the new pair,
+        never one half of each.
+        """
+        self.slices = {**self.slices, label: (matcher, linker)}
+
+    def max_distance(self, label: str, query: str) -> int:
+        length = len(normalize_name(query))
+        if length < MIN_FUZZY_LENGTH:
+            return 0
+        if label in self.max_distances:
+            return int(self.max_distances[label])
+        return min(max(int(length * DEFAULT_DISTANCE_RATIO), 1), MAX_DISTANCE)
+
+    def match(self, literal: str, labels) -> tuple[str, str, int] | None:
+        """Returns the closest (label, name, distance) within each label's threshold.
+
+        Ties go to the label listed first.
+        """
+        best = None
+        slices = self.slices
+        for label in labels:
+            if label not in slices:
+                continue
+            matcher = slices[label][0]
+            max_distance = self.max_distance(label, literal)
+            found = matcher.lookup(literal, max_distance, limit=1)
+            if found and (best is None or found[0][0] < best[2]):
+                best = (label, found[0][1], found[0][0])
+                if best[2] == 0:
+                    break
+        return best
+
+    def min_score(self, label: str) -> float:
+        return float(self.min_scores.get(label, DEFAULT_LINK_MIN_SCORE))
+
+    def link(
+        self, literals: list[str], labels, k: int = 3
+    ) -> dict[str, list[tuple[float, str, str]]]:
+        """Scores every literal against every label's names in one batch per label.
+
+        Returns, per literal, the (score, label, name) candidates above each
+        label's minimum score, best first.
+        """
+        links = {literal: [] for literal in literals}
+        slices = self.slices
+        for label in labels:
+            if label not in slices or not len(slices[label][1]):
+                continue
+            linker = slices[label][1]
+            min_score = self.min_score(label)
+            for literal, found in zip(literals, linker.top_k(literals, k)):
+                links[literal].extend(
+                    (score, label, name) for score, name in found if score >= min_score
+                )
+        for candidates in links.values():
+            candidates.sort(key=lambda c: -c[0])
+        return links
+
+
+# Built and refreshed in the background (see cache_refresher); empty until then
+_lexicon = EntityLexicon()
+
+
+def get_lexicon() -> EntityLexicon:
+    """Returns the current process-wide lexicon without blocking."""
+    return _lexicon
+
+
+def set_lexicon(lexicon: EntityLexicon):
+    global _lexicon
+    _lexicon = lexicon
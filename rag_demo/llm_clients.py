@@ -0,0 +1,179 @@
+# Builds the chat model for each pipeline stage over one shared HTTP connection pool.
+#
+# Stages are routed through a table (model, max_tokens, timeout, latency budget,
+# fallback model) that can be overridden per stage in secrets.toml:
+#
+#   [MODEL_ROUTING.cypher]
+#   model = "gpt-4o"
+#   max_tokens = 800
+#   timeout = 30
+#   latency_budget = 12
+#   fallback_model = "gpt-4o-mini"
+
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import httpx
+import openai
+import streamlit as st
+from cassette import REPLAY, RecordingModel, ReplayModel, get_cassette
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+USER_OPENAI_KEY = "USER_OPENAI_KEY"
+MAX_CACHED_KEYS = 32
+
+# Default route per pipeline stage; `latency_budget` (seconds) only applies
+# when a `fallback_model` is configured
+STAGE_ROUTES = {
+    "interpreter": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.3,
+        "max_tokens": 400,
+        "timeout": 30,
+    },
+    "schema-interpreter": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.3,
+        "max_tokens": 400,
+        "timeout": 30,
+    },
+    "cypher": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.3,
+        "max_tokens": 800,
+        "timeout": 60,
+    },
+    "qa": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.7,
+        "max_tokens": 1000,
+        "timeout": 60,
+    },
+    "final": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.5,
+        "max_tokens": 1500,
+        "timeout": 60,
+    },
+}
+
+# One keep-alive pool for every client, so calls reuse TLS connections
+HTTP_CLIENT = httpx.Client(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=httpx.Timeout(60.0, connect=10.0),
+)
+
+# Runs primary calls that are watched against a latency budget
+_BUDGET_EXECUTOR = ThreadPoolExecutor(
+    max_workers=32, thread_name_prefix="llm-budget"
+)
+
+_TIMEOUT_ERRORS = (FutureTimeoutError, httpx.TimeoutException, openai.APITimeoutError)
+
+
+def load_routes() -> dict[str, dict]:
+    """Returns the stage routing table with any MODEL_ROUTING overrides applied."""
+    try:
+        overrides = st.secrets.get("MODEL_ROUTING", {})
+    except Exception as e:
+        logging.warning(f"Using default model routing, could not read secrets: {e}")
+        overrides = {}
+
+    routes = {}
+    for stage, route in STAGE_ROUTES.items():
+        routes[stage] = {**route, **dict(overrides.get(stage, {}))}
+    return routes
+
+
+class LatencyBudgetedModel(Runnable):
+    """Calls `primary`, switching to `fallback` when it exceeds `latency_budget` seconds.
+
+    The abandoned primary call is not cancelled: it keeps running until it
+    returns or hits its own client timeout, occupying one _BUDGET_EXECUTOR
+    worker the whole time, and its result is discarded. Keep the route's
+    `timeout` close to the budget so slow calls free their worker quickly.
+
+    Works with any chat model, so the fallback can be exercised with fakes
+    (see tests/test_llm_clients.py): a FakeListChatModel subclass whose `_call`
+    sleeps past `latency_budget` as the primary. FakeListChatModel's own `sleep`
+    only delays streaming, so it does not trigger the fallback on invoke().
+    """
+
+    def __init__(
+        self, stage: str, primary, fallback=None, latency_budget: float = None
+    ):
+        self.stage = stage
+        self.primary = primary
+        self.fallback = fallback
+        self.latency_budget = latency_budget
+
+    def invoke(self, input, config=None, **kwargs):
+        if self.fallback is None or self.latency_budget is None:
+            return self.primary.invoke(input, config, **kwargs)
+
+        start = time.perf_counter()
+        future = _BUDGET_EXECUTOR.submit(self.primary.invoke, input, config, **kwargs)
+        try:
+            return future.result(timeout=self.latency_budget)
+        except _TIMEOUT_ERRORS:
+            # The primary call keeps running until its own timeout; its result is discarded
+            logging.warning(
+                f"⏱️ {self.stage} exceeded its {self.latency_budget}s budget "
+                f"after {time.perf_counter() - start:.1f}s — falling back"
+            )
+            return self.fallback.invoke(input, config, **kwargs)
+
+
+def _build_client(api_key: str, route: dict, model: str) -> ChatOpenAI:
+    return ChatOpenAI(
+        api_key=api_key,
+        http_client=HTTP_CLIENT,
+        model=model,
+        temperature=route.get("temperature", 0.3),
+        max_tokens=route.get("max_tokens"),
+        timeout=route.get("timeout"),
+    )
+
+
+def session_api_key() -> str:
+    """Returns the user-supplied OpenAI key for this session, else the app key."""
+    try:
+        user_key = st.session_state.get(USER_OPENAI_KEY)
+    except Exception:
+        # Not running inside a Streamlit session (e.g. the Flask API)
+        user_key = None
+    return user_key or st.secrets["OPENAI_API_KEY"]
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_KEYS)
+def _clients_for_key(api_key: str) -> dict[str, LatencyBudgetedModel]:
+    clients = {}
+    for stage, route in load_routes().items():
+        fallback_model = route.get("fallback_model")
+        clients[stage] = LatencyBudgetedModel(
+            stage,
+            _build_client(api_key, route, route["model"]),
+            _build_client(api_key, route, fallback_model) if fallback_model else None,
+            route.get("latency_budget"),
+        )
+    return clients
+
+
+def get_llm(stage: str, api_key: str = None) -> Runnable:
+    """Returns the cached client for `stage`, built for `api_key` (default: the app key).
+
+    Clients are cached per API key with LRU eviction, so a session's clients
+    are built once and reused for every question. With a cassette enabled the
+    client is wrapped to record its calls, or replaced by a replaying stand-in.
+    """
+    cassette = get_cassette()
+    if cassette and cassette.mode == REPLAY:
+        return ReplayModel(stage, cassette)
+    client = _clients_for_key(api_key or st.secrets["OPENAI_API_KEY"])[stage]
+    if cassette:
+        return RecordingModel(stage, client, cassette)
+    return client
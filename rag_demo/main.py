@@ -8,6 +8,7 @@ from langchain.globals import set_llm_cache
 from langchain_community.cache import InMemoryCache
 from streamlit_feedback import streamlit_feedback
 from constants import TITLE
+from progress import DONE, QUERYING
 import logging
 import rag_agent
 import streamlit as st
@@ -71,6 +72,17 @@ if user_input:
         with st.chat_message("ai"):
 
             # Agent response
+            status = st.status("Working on your question...", expanded=False)
+
+            def show_progress(event):
+                # Each stage replaces the status label as soon as it starts
+                if event.stage == DONE:
+                    return
+                status.update(label=f"{event.message}...")
+                status.write(event.message)
+                if event.stage == QUERYING and event.data.get("cypher_query"):
+                    status.code(event.data["cypher_query"], language="cypher")
+
             with st.spinner("..."):
 
                 message_placeholder = st.empty()
@@ -85,7 +97,9 @@ if user_input:
 
                 agent_response = rag_agent.get_results(
                     question=user_input,
+                    on_progress=show_progress,
                 )
+                status.update(label="Answer ready", state="complete")
 
                 if isinstance(agent_response, dict) is False:
                     logging.warning(
@@ -0,0 +1,104 @@
+# Remembers literals that resolved to no entity, so they skip the lookup next time
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 4096
+
+# Placeholders interpret_question is told to use; they never name an entity
+SENTINEL_LITERALS = {"?", "unknown"}
+
+
+def fingerprint_token(fingerprint: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def _normalize(literal: str) -> str:
+    return " ".join(str(literal).split()).lower()
+
+
+def _entry_key(literal: str, labels) -> str:
+    return f"{_normalize(literal)}|{','.join(sorted(labels))}"
+
+
+class NegativeCache:
+    """Bounded LRU set of unresolvable literals with a TTL.
+
+    Entries are tied to the graph fingerprint they were recorded under: once
+    the fingerprint changes they no longer count, since new data may match.
+    Sentinel literals are always treated as cached.
+
+    A miss is remembered together with the labels the literal was typed as,
+    since how it is resolved depends on them (a geo-typed literal may match a
+    place that an untyped one cannot).
+    """
+
+    def __init__(
+        self, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.fingerprint = None
+        self.hits = 0
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, literal: str) -> bool:
+        return self.contains(literal)
+
+    def contains(self, literal: str, labels=()) -> bool:
+        if _normalize(literal) in SENTINEL_LITERALS:
+            self.hits += 1
+            return True
+        key = _entry_key(literal, labels)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            expires_at, fingerprint = entry
+            if expires_at < time.monotonic() or fingerprint != self.fingerprint:
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def add(self, literal: str, labels=()):
+        normalized = _normalize(literal)
+        if not normalized or normalized in SENTINEL_LITERALS:
+            return
+        key = _entry_key(literal, labels)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, self.fingerprint)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_fingerprint(self, fingerprint: dict):
+        """Records the current graph fingerprint; entries from older ones lapse."""
+        token = fingerprint_token(fingerprint)
+        with self._lock:
+            if token != self.fingerprint:
+                self.fingerprint = token
+                self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _ttl() -> float:
+    try:
+        return float(st.secrets.get("NEGATIVE_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    except Exception:
+        return DEFAULT_TTL_SECONDS
+
+
+unresolvable_literals = NegativeCache(ttl=_ttl())
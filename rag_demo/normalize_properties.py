@@ -0,0 +1,238 @@
+# Maintains normalized shadow copies of the entity-matching properties, so literal
+# lookups are an indexed equality instead of toLower(toString(...)) on every node.
+#
+# For each label in the match map, every node gets
+#   n.__norm_name     its first matchable value, lowercased and whitespace-collapsed
+#   n.__norm_aliases  every other matchable value, normalized the same way (a list)
+# and a range index on __norm_name. Nodes with no matchable value get an empty
+# __norm_name, so every processed node carries one.
+#
+# The app only matches a label on these properties while every node of it has
+# been normalized; a data load that adds nodes switches the label back to the
+# slower toLower(toString(...)) lookup until the job is rerun. The job only
+# writes nodes whose shadow values are missing or stale, so rerun it after
+# each data load:
+#
+#   python normalize_properties.py                  # every label in the climate map
+#   python normalize_properties.py --label Variable --missing-only
+
+import argparse
+import logging
+import sys
+
+from lexicon import ALIAS_PROPERTIES
+
+NORM_NAME = "__norm_name"
+NORM_ALIASES = "__norm_aliases"
+SHADOW_PREFIX = "__norm_"
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def normalize_literal(value) -> str:
+    """Lowercases and collapses whitespace: " Sea  Ice " → "sea ice"."""
+    if isinstance(value, bool):
+        # Match Cypher's toString(true) == "true"
+        value = str(value).lower()
+    return " ".join(str(value).split()).lower()
+
+
+def shadow_values(node: dict, properties: list[str]) -> tuple[str | None, list[str]]:
+    """Returns (__norm_name, __norm_aliases) for a node's matchable properties."""
+    values = []
+    for prop in properties:
+        value = node.get(prop)
+        for item in value if isinstance(value, list) else [value]:
+            if item in (None, ""):
+                continue
+            if prop in ALIAS_PROPERTIES:
+                values.extend(a for a in str(item).split(","))
+            else:
+                values.append(item)
+    normalized = [n for n in (normalize_literal(v) for v in values) if n]
+    if not normalized:
+        return None, []
+    name = normalized[0]
+    # Sorted so an unchanged node always produces the same list
+    return name, sorted(set(normalized) - {name})
+
+
+def index_name(label: str) -> str:
+    return f"norm_name_{label}".lower()
+
+
+def normalized_labels(graph) -> set[str]:
+    """Labels whose every node has a __norm_name, served by an online index.
+
+    Both counts are cheap: the label count comes from the count store and the
+    normalized count from the __norm_name index.
+    """
+    try:
+        rows = graph.query(
+            "SHOW INDEXES YIELD type, entityType, labelsOrTypes, properties, state "
+            "WHERE type = 'RANGE' AND entityType = 'NODE' AND state = 'ONLINE' "
+            "RETURN labelsOrTypes, properties",
+            {},
+        )
+    except Exception as e:
+        logging.warning(f"⚠️ Could not list indexes: {e}")
+        return set()
+    indexed = {
+        row["labelsOrTypes"][0]
+        for row in rows
+        if row["properties"] and row["properties"][0] == NORM_NAME
+    }
+
+    labels = set()
+    for label in indexed:
+        total = graph.query(f"MATCH (n:`{label}`) RETURN count(n) AS count", {})
+        normalized = graph.query(
+            f"MATCH (n:`{label}`) WHERE n.{NORM_NAME} IS NOT NULL "
+            "RETURN count(n) AS count",
+            {},
+        )
+        if total[0]["count"] == normalized[0]["count"]:
+            labels.add(label)
+        else:
+            logging.warning(
+                f"⚠️ {label} has nodes without {NORM_NAME}; rerun normalize_properties.py"
+            )
+    return labels
+
+
+def alias_labels(graph, labels) -> set[str]:
+    """The labels among `labels` with at least one node holding __norm_aliases.
+
+    Alias membership cannot be served by an index, so it is only checked on
+    labels that have aliases at all.
+    """
+    found = set()
+    for label in labels:
+        rows = graph.query(
+            f"MATCH (n:`{label}`) WHERE n.{NORM_ALIASES} IS NOT NULL "
+            "RETURN 1 AS found LIMIT 1",
+            {},
+        )
+        if rows:
+            found.add(label)
+    return found
+
+
+def strip_shadow_properties(structured_schema: dict) -> dict:
+    """Drops __norm_* properties from node_props, so prompts never mention them."""
+    node_props = structured_schema.get("node_props", {})
+    for label, props in node_props.items():
+        node_props[label] = [
+            prop for prop in props if not prop["property"].startswith(SHADOW_PREFIX)
+        ]
+    return structured_schema
+
+
+def normalize_label(
+    reader,
+    writer,
+    label: str,
+    properties: list[str],
+    missing_only: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict[str, int]:
+    """Writes shadow values for `label` nodes that lack them or have stale ones.
+
+    Nodes stream from the `reader` session while batches commit on `writer`.
+    """
+    where = f"WHERE n.{NORM_NAME} IS NULL" if missing_only else ""
+    columns = ", ".join(f"n.`{prop}` AS `{prop}`" for prop in properties)
+    rows = reader.run(
+        f"MATCH (n:`{label}`) {where} RETURN elementId(n) AS id, {columns}, "
+        f"n.{NORM_NAME} AS current_name, n.{NORM_ALIASES} AS current_aliases"
+    )
+
+    counts = {"nodes": 0, "updated": 0}
+    batch = []
+    for row in rows:
+        counts["nodes"] += 1
+        name, aliases = shadow_values(row, properties)
+        # Empty rather than null, so the node counts as normalized
+        name = name or ""
+        if row["current_name"] == name and (row["current_aliases"] or []) == aliases:
+            continue
+        batch.append({"id": row["id"], "name": name, "aliases": aliases or None})
+        if len(batch) >= batch_size:
+            counts["updated"] += _write_batch(writer, batch)
+            batch = []
+    if batch:
+        counts["updated"] += _write_batch(writer, batch)
+
+    # Created last, so the index only appears once every node has been written
+    writer.run(
+        f"CREATE INDEX {index_name(label)} IF NOT EXISTS "
+        f"FOR (n:`{label}`) ON (n.{NORM_NAME})"
+    ).consume()
+    return counts
+
+
+def _write_batch(writer, batch: list[dict]) -> int:
+    def write(tx):
+        tx.run(
+            f"UNWIND $rows AS row MATCH (n) WHERE elementId(n) = row.id "
+            f"SET n.{NORM_NAME} = row.name, n.{NORM_ALIASES} = row.aliases",
+            rows=batch,
+        ).consume()
+
+    writer.execute_write(write)
+    return len(batch)
+
+
+def main(argv=None) -> int:
+    import streamlit as st
+    from neo4j import GraphDatabase
+    from property_metadata import EntityProperties, SessionGraph
+    from templates.match_properties_map import match_climate_properties_map
+
+    parser = argparse.ArgumentParser(
+        description="Write normalized __norm_* properties for entity matching."
+    )
+    parser.add_argument(
+        "--label", action="append", help="only these labels (repeatable)"
+    )
+    parser.add_argument(
+        "--missing-only",
+        action="store_true",
+        help="skip nodes that already have shadow values (fast after a data load)",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    labels = args.label or sorted(match_climate_properties_map)
+    driver = GraphDatabase.driver(
+        st.secrets["NEO4J_URI"],
+        auth=(st.secrets["NEO4J_USERNAME"], st.secrets["NEO4J_PASSWORD"]),
+    )
+    with driver, driver.session() as reader, driver.session() as writer:
+        existing = {row["label"] for row in reader.run("CALL db.labels() YIELD label")}
+        # Embeddings, numbers and long text never become lookup values
+        entity_properties = EntityProperties.build(
+            SessionGraph(reader), match_climate_properties_map, existing
+        )
+        for label in labels:
+            if label not in existing:
+                logging.info(f"⏭️ {label} is not in the graph")
+                continue
+            properties = entity_properties.matchable(label)
+            counts = normalize_label(
+                reader,
+                writer,
+                label,
+                properties,
+                missing_only=args.missing_only,
+                batch_size=args.batch_size,
+            )
+            logging.info(
+                f"✅ {label}: {counts['updated']} of {counts['nodes']} nodes updated"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
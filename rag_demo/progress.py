@@ -0,0 +1,63 @@
+# Typed progress events emitted by the pipeline while a question is being answered
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Pipeline stages, in the order they normally occur
+INTERPRETING = "interpreting"
+RESOLVING_ENTITIES = "resolving_entities"
+GENERATING_CYPHER = "generating_cypher"
+QUERYING = "querying"
+ANSWERING = "answering"
+DONE = "done"
+
+STAGE_LABELS = {
+    INTERPRETING: "Interpreting the question",
+    RESOLVING_ENTITIES: "Resolving entities against the graph",
+    GENERATING_CYPHER: "Generating Cypher",
+    QUERYING: "Querying the knowledge graph",
+    ANSWERING: "Writing the answer",
+    DONE: "Done",
+}
+
+
+@dataclass
+class ProgressEvent:
+    stage: str
+    message: str
+    # Stage-specific payload, e.g. triples or the generated query
+    data: dict = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "message": self.message,
+            "data": self.data,
+            "timestamp": self.timestamp,
+        }
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+class CypherProgressHandler(BaseCallbackHandler):
+    """Reports QUERYING once the graph chain has generated its Cypher.
+
+    GraphCypherQAChain generates and runs the query in one call; the only
+    signal in between is the "Generated Cypher:" text it emits.
+    """
+
+    def __init__(self, emit: Callable[..., None]):
+        self.emit = emit
+        self._next_is_cypher = False
+
+    def on_text(self, text: str, **kwargs):
+        if self._next_is_cypher:
+            self._next_is_cypher = False
+            self.emit(QUERYING, cypher_query=text)
+        elif text.startswith("Generated Cypher:"):
+            self._next_is_cypher = True
@@ -0,0 +1,187 @@
+# Type and matchability of each property in a match_*_properties_map.
+#
+# Literals are only compared against identifier-like properties. Numbers, numeric
+# lists (embeddings such as plotEmbedding), URLs and long free text (plot) are
+# excluded: converting them to strings on every node costs the database a lot
+# and never produces a match. Types come from the structured schema, refined by
+# sampling a few values where the schema only says STRING or LIST.
+
+import logging
+import statistics
+import time
+from dataclasses import dataclass
+
+from lexicon import ALIAS_PROPERTIES
+
+# Values sampled per property when the schema type alone cannot decide
+SAMPLE_SIZE = 50
+# Median string length above which a property is free text rather than a name
+LONG_TEXT_CHARS = 120
+
+NUMERIC_TYPES = {"INTEGER", "FLOAT"}
+TEXT_TYPES = {"STRING", "LIST"}
+
+
+@dataclass
+class PropertyInfo:
+    name: str
+    # Schema type, with the sampled element type for lists, e.g. "LIST<FLOAT>"
+    type: str
+    matchable: bool
+    # Why the property is excluded; empty when it is matchable
+    reason: str = ""
+
+
+def _schema_types(structured_schema: dict, label: str) -> dict[str, str]:
+    props = (structured_schema or {}).get("node_props", {}).get(label, [])
+    return {prop["property"]: str(prop.get("type", "")).upper() for prop in props}
+
+
+def _value_type(value) -> str:
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "FLOAT"
+    if isinstance(value, str):
+        return "STRING"
+    if isinstance(value, list):
+        return "LIST"
+    return type(value).__name__.upper()
+
+
+def classify_values(name: str, schema_type: str, values: list) -> PropertyInfo:
+    """Decides whether a property holding `values` is worth matching literals on."""
+    if not values:
+        return PropertyInfo(name, schema_type or "UNKNOWN", False, "no values")
+    value_type = schema_type or _value_type(values[0])
+    items = [
+        item
+        for value in values
+        for item in (value if isinstance(value, list) else [value])
+    ]
+    if value_type == "LIST":
+        item_types = {_value_type(item) for item in items}
+        value_type = f"LIST<{'|'.join(sorted(item_types)) or 'EMPTY'}>"
+        if item_types & NUMERIC_TYPES:
+            return PropertyInfo(name, value_type, False, "numeric list")
+    elif value_type in NUMERIC_TYPES:
+        return PropertyInfo(name, value_type, False, "numeric")
+    if not all(isinstance(item, str) for item in items):
+        return PropertyInfo(name, value_type, False, "not text")
+    if any("://" in item for item in items):
+        return PropertyInfo(name, value_type, False, "url")
+    # Alias blobs are long because they are comma-joined; they are split on use
+    if name not in ALIAS_PROPERTIES and items:
+        if statistics.median(len(item) for item in items) > LONG_TEXT_CHARS:
+            return PropertyInfo(name, value_type, False, "long text")
+    return PropertyInfo(name, value_type, True)
+
+
+def describe_label(
+    graph, label: str, properties: list[str], structured_schema: dict = None
+) -> list[PropertyInfo]:
+    schema_types = _schema_types(structured_schema, label)
+    infos = []
+    for prop in properties:
+        schema_type = schema_types.get(prop, "")
+        if schema_type and schema_type not in TEXT_TYPES:
+            # Numbers, dates, booleans and points are settled by the schema alone
+            reason = "numeric" if schema_type in NUMERIC_TYPES else "not text"
+            infos.append(PropertyInfo(prop, schema_type, False, reason))
+            continue
+        try:
+            rows = graph.query(
+                f"MATCH (n:`{label}`) WHERE n.`{prop}` IS NOT NULL "
+                f"RETURN n.`{prop}` AS value LIMIT {SAMPLE_SIZE}",
+                {},
+            )
+        except Exception as e:
+            # Keep the property rather than silently stop matching on it
+            logging.warning(f"⚠️ Could not sample {label}.{prop}: {e}")
+            infos.append(PropertyInfo(prop, schema_type or "UNKNOWN", True))
+            continue
+        if any("value" not in row for row in rows):
+            # Neo4jGraph(sanitize=True) drops lists of 128+ items from the row,
+            # which only embeddings reach
+            infos.append(PropertyInfo(prop, "LIST", False, "numeric list"))
+            continue
+        values = [row["value"] for row in rows]
+        infos.append(classify_values(prop, schema_type, values))
+    return infos
+
+
+class EntityProperties:
+    """PropertyInfo per mapped property, grouped by label."""
+
+    def __init__(self, labels: dict[str, list[PropertyInfo]] = None):
+        self.labels = labels or {}
+
+    @classmethod
+    def build(
+        cls,
+        graph,
+        properties_map: dict[str, list[str]],
+        labels=None,
+        structured_schema: dict = None,
+    ) -> "EntityProperties":
+        start = time.perf_counter()
+        described = {}
+        for label, properties in properties_map.items():
+            if labels is None or label in labels:
+                described[label] = describe_label(
+                    graph, label, properties, structured_schema
+                )
+        entity_properties = cls(described)
+        excluded = [
+            f"{label}.{info.name} ({info.reason})"
+            for label, info in entity_properties.excluded()
+        ]
+        if excluded:
+            logging.info(f"🙈 Excluded from entity matching: {', '.join(excluded)}")
+        logging.info(
+            f"🏷️ Described {sum(len(i) for i in described.values())} match "
+            f"properties in {time.perf_counter() - start:.1f}s"
+        )
+        return entity_properties
+
+    def matchable(self, label: str, default=None) -> list[str]:
+        """The label's matchable property names, in map order."""
+        if label not in self.labels:
+            return default if default is not None else ["name"]
+        return [info.name for info in self.labels[label] if info.matchable]
+
+    def matchable_map(self) -> dict[str, list[str]]:
+        return {label: self.matchable(label) for label in self.labels}
+
+    def excluded(self) -> list[tuple[str, PropertyInfo]]:
+        return [
+            (label, info)
+            for label, infos in self.labels.items()
+            for info in infos
+            if not info.matchable
+        ]
+
+
+class SessionGraph:
+    """Minimal graph.query() over a driver session, for the maintenance scripts."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def query(self, query: str, params: dict = None) -> list[dict]:
+        return [record.data() for record in self.session.run(query, params or {})]
+
+
+# Rebuilt with the schema (see rag_agent._load_schema)
+_entity_properties = EntityProperties()
+
+
+def get_entity_properties() -> EntityProperties:
+    return _entity_properties
+
+
+def set_entity_properties(entity_properties: EntityProperties):
+    global _entity_properties
+    _entity_properties = entity_properties
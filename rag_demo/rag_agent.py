@@ -4,10 +4,51 @@ import re
 import urllib.parse
 from datetime import datetime, date, time
 from retry import retry
-from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from entity_resolution import candidate_labels, rank_matches, relationship_endpoints
+from entity_stats import get_entity_stats
+from gazetteer import GEO_LABELS, get_gazetteer
+from lexicon import get_lexicon
+from negative_cache import unresolvable_literals
+from property_metadata import (
+    EntityProperties,
+    get_entity_properties,
+    set_entity_properties,
+)
+from normalize_properties import (
+    NORM_ALIASES,
+    NORM_NAME,
+    alias_labels,
+    normalize_literal,
+    normalized_labels,
+)
+from extraction_stats import (
+    FREE_MODE,
+    SCHEMA_MODE,
+    extraction_stats,
+    question_bucket,
+)
 from graph_cypher_tool import graph_cypher_tool
-from graph_cypher_chain import graph, parse_schema
+from cache_refresher import CacheRefresher
+from cassette import REPLAY, CassetteMiss, ReplayGraph, get_cassette
+from graph_cypher_chain import generate_cypher, get_graph_chain, graph, parse_schema
+from conversation_memory import get_session_memory
+from llm_clients import get_llm, session_api_key
+from progress import (
+    ANSWERING,
+    DONE,
+    GENERATING_CYPHER,
+    INTERPRETING,
+    RESOLVING_ENTITIES,
+    CypherProgressHandler,
+    ProgressCallback,
+)
+from request_context import RequestContext
+from schema_state import SchemaState, get_schema_state, set_schema_state
+from single_flight import SingleFlight, flight_key
+from answer_renderer import render_answer
+from result_compaction import compact_results
+from token_budget import PromptSection, fit_sections, fit_turns, stage_budget
 from templates.entity_definitions import entity_climate_definitions
 from templates.match_properties_map import match_climate_properties_map
 
@@ -41,55 +82,88 @@ def _normalize_value(value):
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
-# LLM Configuration
-llm = ChatOpenAI(
-    api_key=st.secrets["OPENAI_API_KEY"],
-    temperature=0.5,
-    model="gpt-4o-mini",
-)
-
-interpreter_llm = ChatOpenAI(
-    api_key=st.secrets["OPENAI_API_KEY"],
-    temperature=0.3,
-    model="gpt-4o-mini",
-)
+def strip_quotes(s):
+    return s.strip("'").strip('"')
 
 
-@st.cache_data(show_spinner=False)
-def get_schema_str():
-    return (
-        "Available Labels:\n"
-        + "\n".join(f"- {label}" for label in sorted(schema_labels))
-        + "\n\nAvailable Relationships:\n"
-        + "\n".join(f"- {rel}" for rel in sorted(schema_relationships))
-        + "\n"
+def _load_schema() -> set[str]:
+    """Parses the graph's current schema and swaps in a new SchemaState."""
+    schema_text = graph.get_schema
+    labels, relationships = parse_schema(schema_text)
+    # Labels the normalization job has finished are matched on __norm_* properties
+    shadow_labels = normalized_labels(graph)
+    schema = SchemaState(
+        text=schema_text,
+        labels=frozenset(labels),
+        relationships=frozenset(relationships),
+        endpoints=relationship_endpoints(graph.structured_schema),
+        shadow_labels=frozenset(shadow_labels),
+        shadow_alias_labels=frozenset(alias_labels(graph, shadow_labels)),
     )
+    # Only identifier-like properties are compared with literals
+    set_entity_properties(
+        EntityProperties.build(
+            graph, match_climate_properties_map, labels, graph.structured_schema
+        )
+    )
+    logging.info("✅ Loaded schema labels:")
+    for label in sorted(labels):
+        logging.info(f"   - {label}")
 
-
-def strip_quotes(s):
-    return s.strip("'").strip('"')
+    logging.info("✅ Loaded schema relationships:")
+    for rel in sorted(relationships):
+        logging.info(f"   - {rel}")
+    set_schema_state(schema)
+    # Chains bake the schema into their prompt when built
+    get_graph_chain.cache_clear()
+    return labels
 
 
-# Fetch & parse schema once
+# Fetch & parse schema once; the refresher re-parses it when the graph changes
 graph.refresh_schema()
-schema_text = graph.get_schema
-schema_labels, schema_relationships = parse_schema(schema_text)
-logging.info("✅ Loaded schema labels:")
-for label in sorted(schema_labels):
-    logging.info(f"   - {label}")
+_load_schema()
 
-logging.info("✅ Loaded schema relationships:")
-for rel in sorted(schema_relationships):
-    logging.info(f"   - {rel}")
-schema_labels_str = "\n".join(f"- {label}" for label in sorted(schema_labels))
-schema_rels_str = "\n".join(f"- {rel}" for rel in sorted(schema_relationships))
+cache_refresher = CacheRefresher(
+    graph,
+    get_entity_properties().matchable_map(),
+    get_schema_state().labels,
+    on_schema_change=_load_schema,
+)
+if isinstance(graph, ReplayGraph):
+    # Replays build from the cassette up front so runs stay deterministic
+    cache_refresher.warm()
+else:
+    cache_refresher.start()
 
 
 # Triple-Extractor Functions
 
 
+def _interpreter_messages(
+    stage: str,
+    system_prompt: str,
+    conversation_history: list[dict[str, str]],
+    user_question: str,
+) -> list:
+    turns = fit_turns(
+        stage,
+        [
+            PromptSection("system", system_prompt, trimmable=False),
+            PromptSection("question", user_question, trimmable=False),
+        ],
+        conversation_history,
+    )
+
+    messages: list = [SystemMessage(content=system_prompt)]
+    for turn in turns:
+        messages.append(HumanMessage(content=turn["input"]))
+        messages.append(AIMessage(content=turn["output"]))
+    messages.append(HumanMessage(content=user_question))
+    return messages
+
+
 def interpret_question(
-    user_question: str, conversation_history: list[dict[str, str]]
+    user_question: str, conversation_history: list[dict[str, str]], api_key: str = None
 ) -> tuple[str, list[tuple[str, str, str]]]:
     system_prompt = (
         "You are a Neo4j graph assistant. Your job is to: \n"
@@ -106,13 +180,11 @@ def interpret_question(
         "Be concise. Do NOT add explanation or extra commentary.\n"
     )
 
-    messages: list = [SystemMessage(content=system_prompt)]
-    for turn in conversation_history[-3:]:
-        messages.append(HumanMessage(content=turn["input"]))
-        messages.append(AIMessage(content=turn["output"]))
-    messages.append(HumanMessage(content=user_question))
+    messages = _interpreter_messages(
+        "interpreter", system_prompt, conversation_history, user_question
+    )
 
-    response = interpreter_llm.invoke(messages).content.strip()
+    response = get_llm("interpreter", api_key).invoke(messages).content.strip()
 
     lines = response.splitlines()
     rewritten = ""
@@ -128,7 +200,10 @@ def interpret_question(
 
 
 def interpret_question_with_schema(
-    user_question: str, conversation_history: list[dict[str, str]], schema_str: str
+    user_question: str,
+    conversation_history: list[dict[str, str]],
+    schema: SchemaState,
+    api_key: str = None,
 ) -> tuple[str, list[tuple[str, str, str]]]:
     system_prompt = (
         f"""
@@ -147,10 +222,10 @@ Your job is to:
 - If no valid triple can be made, just say: `Rewritten: <clarified question>` and no triples.
 
 ### Allowed Node Labels:
-{schema_labels_str}
+{schema.labels_str}
 
 ### Allowed Relationship Types:
-{schema_rels_str}
+{schema.rels_str}
 
 Output format:
 Rewritten: <clarified question>
@@ -162,13 +237,13 @@ Triples:
         + entity_climate_definitions
     )
 
-    messages: list = [SystemMessage(content=system_prompt)]
-    for turn in conversation_history[-3:]:
-        messages.append(HumanMessage(content=turn["input"]))
-        messages.append(AIMessage(content=turn["output"]))
-    messages.append(HumanMessage(content=user_question))
+    messages = _interpreter_messages(
+        "schema-interpreter", system_prompt, conversation_history, user_question
+    )
 
-    response = interpreter_llm.invoke(messages).content.strip()
+    response = (
+        get_llm("schema-interpreter", api_key).invoke(messages).content.strip()
+    )
 
     lines = response.splitlines()
     rewritten = ""
@@ -186,45 +261,240 @@ Triples:
 # Triple Verification
 
 
-def verify_triples(triples, schema_labels, schema_relationships):
+def _match_shadow(literal: str, label: str, schema: SchemaState) -> str | None:
+    """Returns the id of a `label` node whose __norm_* properties hold `literal`."""
+    normalized = normalize_literal(literal)
+    # The name is an index seek; alias lists cannot be indexed, so they are
+    # only scanned on a miss, and only for labels that have aliases at all
+    conditions = [f"n.{NORM_NAME} = $name"]
+    if label in schema.shadow_alias_labels:
+        conditions.append(f"$name IN n.{NORM_ALIASES}")
+    for condition in conditions:
+        result = graph.query(
+            f"MATCH (n:`{label}`) WHERE {condition} RETURN elementId(n) AS id LIMIT 1",
+            {"name": normalized},
+        )
+        if result and result[0].get("id"):
+            return result[0]["id"]
+    return None
+
+
+def _match_literal(
+    literal: str, labels, schema: SchemaState
+) -> list[tuple[str, str]]:
+    """Returns (label, node id) for each label with a node matching `literal`.
+
+    Each label stops at its first matching property.
+    """
+    matches = []
+    for label in labels:
+        if label in schema.shadow_labels:
+            try:
+                node_id = _match_shadow(literal, label, schema)
+            except Exception as e:
+                logging.warning(f"⚠️ Error checking {literal} on {label}: {e}")
+                continue
+            if node_id:
+                logging.info(f"🔎 Matched instance: {literal} as {label}")
+                matches.append((label, node_id))
+            continue
+
+        properties_to_try = get_entity_properties().matchable(label)
+        for prop in properties_to_try:
+            try:
+                query = f"""
+                MATCH (n:{label})
+                WHERE toLower(toString(n.{prop})) = toLower(toString($name))
+                RETURN elementId(n) AS id LIMIT 1
+                """
+                result = graph.query(query, {"name": literal})
+                if result and result[0].get("id"):
+                    logging.info(f"🔎 Matched instance: {literal} as {label}.{prop}")
+                    matches.append((label, result[0]["id"]))
+                    break
+            except Exception as e:
+                logging.warning(f"⚠️ Error checking {literal} on {label}.{prop}: {e}")
+    return matches
+
+
+def _match_places(literal: str, typed: list[str]) -> list[tuple[str, str, str, str]]:
+    """Returns the gazetteer places named in `literal` as (phrase, label, name, id)."""
+    geo_typed = [label for label in typed if label in GEO_LABELS]
+    if get_gazetteer() is None or (typed and not geo_typed):
+        # The predicates rule out every geographic label
+        return []
+    gazetteer = get_gazetteer()
+    found = gazetteer.exact(literal, geo_typed or None)
+    if found and (geo_typed or gazetteer.is_code(literal)):
+        places = [(literal, *found[0])]
+    else:
+        # Untyped literals only count as places when they are nothing else
+        places = gazetteer.find_places(
+            literal, geo_typed or None, full_cover=not geo_typed
+        )
+    for phrase, label, name, _ in places:
+        logging.info(f"🌍 Matched place: {phrase} as {label} {name}")
+    return places
+
+
+def _add_places(literal: str, typed: list[str], instance_triples: list) -> bool:
+    """Adds an instanceOf triple per place named in `literal`; True if any were."""
+    places = _match_places(literal, typed)
+    for _, label, name, _ in places:
+        triple = (name, "instanceOf", label)
+        if triple not in instance_triples:
+            instance_triples.append(triple)
+    return bool(places)
+
+
+def _fuzzy_match_literal(
+    literal: str, typed: list[str], schema: SchemaState
+) -> tuple[str | None, str]:
+    """Returns (label, canonical name) for the closest lexicon entry, typed labels first."""
+    lexicon = get_lexicon()
+    rest = [label for label in sorted(schema.labels) if label not in typed]
+    for labels in (typed, rest):
+        match = lexicon.match(literal, labels)
+        if match:
+            label, name, distance = match
+            logging.info(
+                f"≈ Fuzzy matched instance: {literal} → {name} as {label} (distance {distance})"
+            )
+            return label, name
+    return None, literal
+
+
+def _link_literals(
+    unresolved: dict[str, list[str]], schema: SchemaState
+) -> dict[str, tuple[str, str]]:
+    """Links literals to (label, name) by TF-IDF similarity, preferring typed labels.
+
+    `unresolved` maps each literal to its predicate-implied labels. Each label
+    has its own vectorizer, so raw scores are only compared within a label:
+    the first typed label with a candidate wins, and otherwise labels are
+    compared on how far the score clears that label's minimum.
+    """
+    if not unresolved:
+        return {}
+    lexicon = get_lexicon()
+    links = lexicon.link(list(unresolved), sorted(schema.labels))
+
+    def margin(candidate):
+        score, label, _ = candidate
+        min_score = lexicon.min_score(label)
+        return (score - min_score) / max(1 - min_score, 1e-9)
+
+    linked = {}
+    for literal, candidates in links.items():
+        typed = unresolved[literal]
+        preferred = next(
+            (
+                [c for c in candidates if c[1] == label]
+                for label in typed
+                if any(c[1] == label for c in candidates)
+            ),
+            sorted(candidates, key=margin, reverse=True),
+        )
+        if preferred:
+            score, label, name = preferred[0]
+            logging.info(
+                f"🔗 Linked instance: {literal} → {name} as {label} (score {score:.2f})"
+            )
+            linked[literal] = (label, name)
+    return linked
+
+
+def verify_triples(triples, schema: SchemaState):
+    schema_labels, schema_relationships = schema.labels, schema.relationships
     verified_triples = []
     instance_triples = []
 
     # Collect all literals from subject/object that are NOT labels or relationships
     literals = set()
+    cleaned = []
     for s, p, o in triples:
         s_clean = strip_quotes(s)
         o_clean = strip_quotes(o)
+        cleaned.append((s_clean, p, o_clean))
         if s_clean not in schema_labels and s_clean not in schema_relationships:
             literals.add(s_clean)
         if o_clean not in schema_labels and o_clean not in schema_relationships:
             literals.add(o_clean)
 
-    # Try matching each literal across schema labels + their properties
+    # Try the labels the predicates allow first (e.g. the object of
+    # PRODUCES_VARIABLE is a Variable), widening to every label only on a miss
+    unresolved = {}
     for literal in literals:
-        for label in schema_labels:
-            properties_to_try = match_climate_properties_map.get(
-                label, ["name"]
-            )  # fallback to "name"
-            for prop in properties_to_try:
-                try:
-                    query = f"""
-                    MATCH (n:{label})
-                    WHERE toLower(toString(n.{prop})) = toLower(toString($name))
-                    RETURN n LIMIT 1
-                    """
-                    result = graph.query(query, {"name": literal})
-                    if result and result[0].get("n"):
-                        triple = (literal, "instanceOf", label)
-                        if triple not in instance_triples:
-                            instance_triples.append(triple)
-                            logging.info(
-                                f"🔎 Matched instance: {literal} as {label}.{prop}"
-                            )
-                except Exception as e:
-                    logging.warning(
-                        f"⚠️ Error checking {literal} on {label}.{prop}: {e}"
-                    )
+        typed = candidate_labels(
+            literal, cleaned, schema.endpoints, schema_labels
+        )
+        if unresolvable_literals.contains(literal, typed):
+            # Matched nothing under the current graph with these candidate
+            # labels (or is a placeholder like "?")
+            logging.info(f"🚫 Skipping unresolvable literal: {literal}")
+            continue
+        # Places ("Florida, USA") resolve from the in-memory gazetteer. Only
+        # geo-typed literals try it first: an untyped "ocean" may also be a
+        # town alias, so the other labels get the first say
+        geo_typed = any(label in GEO_LABELS for label in typed)
+        if geo_typed and _add_places(literal, typed, instance_triples):
+            continue
+
+        # Once built, the gazetteer holds every geographic name, so the
+        # database is only asked about the other labels
+        skipped = GEO_LABELS if get_gazetteer() is not None else []
+        typed_rest = [label for label in typed if label not in skipped]
+        matches = _match_literal(literal, typed_rest, schema)
+        if not matches:
+            if typed_rest:
+                logging.info(f"↔️ No {typed_rest} match for {literal}, trying all labels")
+            matches = _match_literal(
+                literal,
+                [
+                    label
+                    for label in schema_labels
+                    if label not in typed and label not in skipped
+                ],
+                schema,
+            )
+        if len(matches) > 1:
+            # Ambiguous ("historical", "CMIP6"): keep the most plausible label(s)
+            predicates = {p for s, p, o in cleaned if literal in (s, o)}
+            ranked = rank_matches(matches, predicates, get_entity_stats())
+            logging.info(
+                f"⚖️ {literal} matched {[m[0] for m in matches]}, "
+                f"kept {[m[0] for m in ranked]}"
+            )
+            matches = ranked
+        if matches:
+            for label, _ in matches:
+                triple = (literal, "instanceOf", label)
+                if triple not in instance_triples:
+                    instance_triples.append(triple)
+            continue
+        if not geo_typed and _add_places(literal, typed, instance_triples):
+            continue
+
+        # Misspelled names ("NorESM2LM") resolve to the closest known name
+        label, name = _fuzzy_match_literal(literal, typed, schema)
+        if label is None:
+            unresolved[literal] = typed
+            continue
+        triple = (name, "instanceOf", label)
+        if triple not in instance_triples:
+            instance_triples.append(triple)
+
+    # Whatever is left is linked by TF-IDF similarity, all literals in one batch
+    linked = _link_literals(unresolved, schema)
+    for label, name in linked.values():
+        triple = (name, "instanceOf", label)
+        if triple not in instance_triples:
+            instance_triples.append(triple)
+
+    # Only trust a miss once the lexicon has been built
+    if get_lexicon().slices:
+        for literal in unresolved.keys() - linked.keys():
+            unresolvable_literals.add(literal, unresolved[literal])
 
     # Validate triples against schema relationships
     for s, p, o in triples:
@@ -240,55 +510,100 @@ def verify_triples(triples, schema_labels, schema_relationships):
     return verified_triples, instance_triples
 
 
-# Conversation History
+# Main LLM Pipeline
 
-conversation_history = []
+FINAL_PROMPT_TEMPLATE = """
+Based on the conversation and the user question, provide a relevant and helpful response.
 
-# Main LLM Pipeline
+Conversation:
+{conversation}
 
+Current question: {question}
+Rewritten question: {rewritten}
 
-def process_with_llm(question: str) -> str:
-    # Rebuild conversation_history from Streamlit session
-    conversation_history.clear()
-    for msg in st.session_state.get("messages", []):
-        if msg["role"] == "user":
-            conversation_history.append({"input": msg["content"], "output": ""})
-        elif msg["role"] == "ai" and conversation_history:
-            conversation_history[-1]["output"] = msg["content"]
+Here is the output from the database:
+{result}
+
+Please process the output and answer the user question clearly.
+Always end your answer with the exact phrase:
+"Please click here to access the knowledge graph: [[button_query]]"
+Do not use any other wording for the link.
+""".strip()
 
-    conversation_text = "\n".join(
-        [
-            f"User: {msg['input']}\nBot: {msg['output']}"
-            for msg in conversation_history[-3:]
-        ]
-    )
 
-    # Retry loop for triple extraction
-    MAX_ATTEMPTS = 5
+def _extraction_plan(
+    ctx: RequestContext, bucket: str, max_attempts: int
+) -> tuple[str, int]:
+    """Returns extraction_stats' plan, recorded to and replayed from the cassette.
+
+    The plan explores at random and adapts as outcomes accumulate, so a replay
+    must reuse the recorded one to make the same LLM calls. Cassettes recorded
+    without plans replay the default one.
+    """
+    cassette = get_cassette()
+    request = {
+        "question": ctx.question,
+        "history": ctx.conversation_text,
+        "bucket": bucket,
+        "max_attempts": max_attempts,
+    }
+    if cassette and cassette.mode == REPLAY:
+        try:
+            start_mode, attempt_limit = cassette.replay("plan", request)
+            return start_mode, attempt_limit
+        except CassetteMiss:
+            return FREE_MODE, max_attempts
+    start_mode, attempt_limit = extraction_stats.plan(bucket, max_attempts)
+    if cassette:
+        cassette.record("plan", request, [start_mode, attempt_limit])
+    return start_mode, attempt_limit
+
+
+def extract_triples(ctx: RequestContext, max_attempts: int = 5):
+    """Rewrites the question and collects verified and instance triples on `ctx`.
+
+    The starting mode and attempt limit come from the recorded outcomes of
+    similar questions, so questions that always need schema mode skip the
+    free-form call.
+    """
     attempt = 0
     verified_triples = []
     instance_triples = []
     triples = []
     rewritten = ""
+    outcomes = []
+
+    # One snapshot for the whole request, even if the refresher reloads meanwhile
+    if ctx.schema is None:
+        ctx.schema = get_schema_state()
+    bucket = question_bucket(ctx.question, ctx.schema.labels)
+    start_mode, attempt_limit = _extraction_plan(ctx, bucket, max_attempts)
+    if (start_mode, attempt_limit) != (FREE_MODE, max_attempts):
+        logging.info(
+            f"📊 Extraction plan for [{bucket}]: start={start_mode}, attempts={attempt_limit}"
+        )
 
-    while attempt < MAX_ATTEMPTS and not verified_triples:
-        if attempt == 0:
-            rewritten, triples = interpret_question(question, conversation_history)
-        else:
-            logging.warning(
-                f"Retry #{attempt}: no valid triples yet — using schema-enforced mode."
+    while attempt < attempt_limit and not verified_triples:
+        ctx.emit(INTERPRETING, attempt=attempt + 1)
+        mode = start_mode if attempt == 0 else SCHEMA_MODE
+        if mode == FREE_MODE:
+            rewritten, triples = interpret_question(
+                ctx.question, ctx.conversation_history, ctx.api_key
             )
-            schema_str = get_schema_str()
-
-            st.code(schema_str, language="markdown")
+        else:
+            if attempt:
+                logging.warning(
+                    f"Retry #{attempt}: no valid triples yet — using schema-enforced mode."
+                )
+            if ctx.show_steps:
+                st.code(ctx.schema.prompt_str, language="markdown")
             rewritten, triples = interpret_question_with_schema(
-                question, conversation_history, schema_str
+                ctx.question, ctx.conversation_history, ctx.schema, ctx.api_key
             )
 
+        ctx.emit(RESOLVING_ENTITIES, rewritten=rewritten, triples=triples)
         # Fix: preserve instance_triples across retries
-        temp_verified, temp_instance = verify_triples(
-            triples, schema_labels, schema_relationships
-        )
+        temp_verified, temp_instance = verify_triples(triples, ctx.schema)
 
         for t in temp_instance:
             if t not in instance_triples:
@@ -297,33 +612,49 @@ def process_with_llm(question: str) -> str:
         if temp_verified:
             verified_triples = temp_verified
 
+        outcomes.append((mode, bool(temp_verified)))
         attempt += 1
 
+    cassette = get_cassette()
+    if not (cassette and cassette.mode == REPLAY):
+        # Replayed runs would only echo recorded outcomes into the live stats
+        extraction_stats.record(bucket, outcomes)
+
     if not verified_triples:
-        if not verified_triples:
-            logging.warning(
-                f"❌ Still no verified triples after {attempt} attempts — using unverified ones: {triples}"
-            )
+        logging.warning(
+            f"❌ Still no verified triples after {attempt} attempts — using unverified ones: {triples}"
+        )
 
         verified_triples = triples
         if not instance_triples:
             logging.warning("⚠️ No instance triples found — falling back without them.")
 
-    st.write(f"Input: {question}")
-    st.write(f"Rewritten: {rewritten}")
-    st.write(f"Verified Triples: {verified_triples}")
-    st.write(f"Instance Triples: {instance_triples}")
+    ctx.rewritten = rewritten
+    ctx.triples = triples
+    ctx.verified_triples = verified_triples
+    ctx.instance_triples = instance_triples
+    ctx.attempts = attempt
+
 
+def query_graph(ctx: RequestContext):
+    """Generates and runs the Cypher query, storing query text and result on `ctx`."""
     # Send dict payload to tool
-    logging.info(f"💾 FINAL instance_triples passed to LLM: {instance_triples}")
+    logging.info(f"💾 FINAL instance_triples passed to LLM: {ctx.instance_triples}")
+    ctx.emit(
+        GENERATING_CYPHER,
+        verified_triples=ctx.verified_triples,
+        instance_triples=ctx.instance_triples,
+    )
     tool_output = graph_cypher_tool.invoke(
         {
-            "question": question,
-            "rewritten": rewritten,
-            "verified_triples": verified_triples,
-            "instance_triples": instance_triples,
-            "history": conversation_text,
-        }
+            "question": ctx.question,
+            "rewritten": ctx.rewritten,
+            "verified_triples": ctx.verified_triples,
+            "instance_triples": ctx.instance_triples,
+            "history": ctx.conversation_text,
+            "api_key": ctx.api_key,
+        },
+        config={"callbacks": [CypherProgressHandler(ctx.emit)]},
     )
 
     if isinstance(tool_output, dict):
@@ -333,18 +664,51 @@ def process_with_llm(question: str) -> str:
         result_payload = {"result": tool_output}
         encoded_query, decoded_query = "", ""
 
-    encoded_query = encoded_query or ""
-    decoded_query = decoded_query or ""
-    result_payload["result"] = _normalize_value(result_payload.get("result"))
-    result_only = result_payload.get("result")
+    ctx.encoded_query = encoded_query or ""
+    ctx.cypher_query = decoded_query or ""
+    ctx.result = _normalize_value(result_payload.get("result"))
+    ctx.error = result_payload.get("error")
+
+
+def generate_query(ctx: RequestContext):
+    """Generates the Cypher query for `ctx` without running it (paged results)."""
+    ctx.emit(
+        GENERATING_CYPHER,
+        verified_triples=ctx.verified_triples,
+        instance_triples=ctx.instance_triples,
+    )
+    query = generate_cypher(
+        question=ctx.question,
+        rewritten=ctx.rewritten,
+        verified_triples=ctx.verified_triples,
+        instance_triples=ctx.instance_triples,
+        history=ctx.conversation_text,
+        api_key=ctx.api_key,
+    )
+    ctx.cypher_query = query
+    ctx.encoded_query = urllib.parse.quote(query) if query else ""
+
+
+def process_with_llm(ctx: RequestContext) -> str:
+    extract_triples(ctx)
+
+    if ctx.show_steps:
+        st.write(f"Input: {ctx.question}")
+        st.write(f"Rewritten: {ctx.rewritten}")
+        st.write(f"Verified Triples: {ctx.verified_triples}")
+        st.write(f"Instance Triples: {ctx.instance_triples}")
+
+    query_graph(ctx)
+
+    result_only = ctx.result
     if not result_only:
-        result_only = result_payload.get("error") or "No results found."
-    if decoded_query:
-        st.code(decoded_query, language="cypher")
+        result_only = ctx.error or "No results found."
+    if ctx.cypher_query and ctx.show_steps:
+        st.code(ctx.cypher_query, language="cypher")
 
     # --- Build Neo4j Browser link dynamically based on current secrets.toml ---
     # --- Force Neo4j Browser link for CMIP climate model instance ---
-    last_query = encoded_query  # encoded_query already created above
+    last_query = ctx.encoded_query
 
     neo4j_link = (
         f"[Open Neo4J](https://neoforjcmip.templeuni.com/browser/?preselectAuthMethod=NO_AUTH&cmd=edit&arg={last_query})"
@@ -357,39 +721,76 @@ def process_with_llm(question: str) -> str:
             f"It appears that there are no models that include the requested variable in the database. "
             f"Please click here to access the knowledge graph: {neo4j_link}"
         )
+    elif rendered := render_answer(ctx.question, result_only, neo4j_link):
+        # Simple result shape: answer without a second LLM round trip
+        logging.info("🧾 Rendered answer from template, skipping final LLM call")
+        final_response = rendered
     else:
-        final_prompt = f"""
-Based on the conversation and the user question, provide a relevant and helpful response.
-
-Conversation:
-{conversation_text}
-
-Current question: {question}
-Rewritten question: {rewritten}
-
-Here is the output from the database:
-{result_only}
+        ctx.emit(ANSWERING)
+        # Conversation is trimmed before the database output
+        sections = fit_sections(
+            "final",
+            [
+                PromptSection("template", FINAL_PROMPT_TEMPLATE, trimmable=False),
+                PromptSection("conversation", ctx.conversation_text, priority=0),
+                PromptSection("question", ctx.question, trimmable=False),
+                PromptSection("rewritten", ctx.rewritten, priority=2),
+                PromptSection(
+                    "result",
+                    compact_results(result_only, stage_budget("final-result")),
+                    priority=1,
+                    min_tokens=50,
+                ),
+            ],
+        )
 
-Please process the output and answer the user question clearly.
-Always end your answer with the exact phrase:
-"Please click here to access the knowledge graph: [[button_query]]"
-Do not use any other wording for the link.
-""".strip()
+        final_prompt = FINAL_PROMPT_TEMPLATE.format(
+            conversation=sections["conversation"],
+            question=ctx.question,
+            rewritten=sections["rewritten"],
+            result=sections["result"],
+        )
 
-        final_response = llm.invoke(final_prompt).content.strip()
+        final_response = (
+            get_llm("final", ctx.api_key).invoke(final_prompt).content.strip()
+        )
         final_response = final_response.replace("[[button_query]]", neo4j_link)
 
-    conversation_history.append({"input": question, "output": final_response})
-
+    ctx.answer = final_response
+    ctx.emit(DONE)
     return final_response
 
 
 # Public Function
 
+# Concurrent identical questions (with identical history) share one pipeline run
+question_flights = SingleFlight()
+
 
 @retry(tries=2, delay=10)
-def get_results(question: str) -> dict:
-    llm_processed_output = process_with_llm(question)
+def get_results(question: str, on_progress: ProgressCallback = None) -> dict:
+    """Answers `question` in the current Streamlit session.
+
+    `on_progress` receives a ProgressEvent as each stage starts. A question
+    that joins an identical in-flight run only receives the final answer.
+    """
+    # Bring the session's bounded memory up to date with the chat transcript
+    memory = get_session_memory()
+    memory.sync(st.session_state.get("messages", []))
+    ctx = RequestContext(
+        question=question,
+        conversation_history=memory.as_turns(),
+        conversation_text=memory.as_text(),
+        show_steps=True,
+        api_key=session_api_key(),
+        on_progress=on_progress,
+    )
+
+    llm_processed_output = question_flights.do(
+        flight_key(question, ctx.conversation_text, ctx.api_key),
+        process_with_llm,
+        ctx,
+    )
     return {
         "input": question,
         "output": llm_processed_output,
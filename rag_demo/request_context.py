@@ -0,0 +1,52 @@
+# Per-request state for the question-answering pipeline.
+#
+# Everything a single question reads or produces lives on its RequestContext,
+# so concurrent requests (threaded Flask, several Streamlit sessions in one
+# process) never share mutable state.
+
+import logging
+from dataclasses import dataclass, field
+
+from progress import STAGE_LABELS, ProgressCallback, ProgressEvent
+from schema_state import SchemaState
+
+
+@dataclass
+class RequestContext:
+    question: str
+    # Bounded history turns ({"input", "output"}) and their prompt rendering
+    conversation_history: list[dict[str, str]] = field(default_factory=list)
+    conversation_text: str = ""
+    # Render intermediate steps (triples, schema, Cypher) in the Streamlit UI
+    show_steps: bool = False
+    # OpenAI key for this request's LLM calls; None uses the app key
+    api_key: str = None
+    # Receives a ProgressEvent as each pipeline stage starts
+    on_progress: ProgressCallback = None
+    # Schema snapshot the request resolves against; taken when extraction starts
+    schema: SchemaState = None
+
+    # Triple extraction
+    rewritten: str = ""
+    triples: list[tuple[str, str, str]] = field(default_factory=list)
+    verified_triples: list[tuple[str, str, str]] = field(default_factory=list)
+    instance_triples: list[tuple[str, str, str]] = field(default_factory=list)
+    attempts: int = 0
+
+    # Graph query
+    encoded_query: str = ""
+    cypher_query: str = ""
+    result: object = None
+    error: str = None
+
+    # Final answer
+    answer: str = ""
+
+    def emit(self, stage: str, **data):
+        """Reports that `stage` has started; callback errors never fail the request."""
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(ProgressEvent(stage, STAGE_LABELS.get(stage, stage), data))
+        except Exception as e:
+            logging.warning(f"⚠️ Progress callback failed for {stage}: {e}")
@@ -0,0 +1,99 @@
+# Compacts Cypher results into a deduplicated table before they are handed to the final-answer LLM
+
+import json
+
+from token_budget import count_tokens
+
+MAX_LIST_ITEMS = 10
+MAX_VALUE_CHARS = 200
+
+
+def _flatten_row(row: dict) -> dict:
+    # Node/map values become dotted columns, e.g. {"s": {"name": ..}} -> "s.name"
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict) and value:
+            for sub_key, sub_value in value.items():
+                flat[f"{key}.{sub_key}"] = sub_value
+        else:
+            flat[key] = value
+    return flat
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        items = [_format_value(v) for v in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"(+{len(value) - MAX_LIST_ITEMS} more)")
+        return "[" + ", ".join(items) + "]"
+    if isinstance(value, dict):
+        text = json.dumps(value, default=str, ensure_ascii=False)
+    else:
+        text = str(value)
+    text = " ".join(text.split()).replace("|", "/")
+    if len(text) > MAX_VALUE_CHARS:
+        text = text[:MAX_VALUE_CHARS] + "..."
+    return text
+
+
+def to_columnar(rows: list[dict]) -> tuple[list[str], list[list]]:
+    """Returns (columns, rows as value lists) for a list of flat dict rows."""
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    return columns, [[row.get(column) for column in columns] for row in rows]
+
+
+def compact_results(result, max_tokens: int) -> str:
+    """Renders a Cypher result as a compact table that fits `max_tokens`.
+
+    Rows are flattened and deduplicated, columns holding the same value in
+    every row are stated once above the table, long lists are capped with a
+    count, and rows beyond the budget are summarized as a count.
+    """
+    if not isinstance(result, list) or not all(isinstance(r, dict) for r in result):
+        return str(result)
+
+    formatted = []
+    seen = set()
+    for row in result:
+        flat = _flatten_row(row)
+        # Deduplicate on the full values: rows that only differ past the
+        # truncation point are still distinct results
+        key = json.dumps(flat, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            formatted.append({k: _format_value(v) for k, v in flat.items()})
+    duplicates = len(result) - len(formatted)
+
+    columns, table = to_columnar(formatted)
+    constant = {}
+    if len(table) > 1:
+        for i, column in enumerate(columns):
+            if len({row[i] for row in table}) == 1:
+                constant[column] = table[0][i]
+    varying = [i for i, column in enumerate(columns) if column not in constant]
+
+    summary = f"{len(formatted)} rows"
+    if duplicates:
+        summary += f" ({duplicates} duplicate rows removed)"
+    lines = [summary]
+    for column, value in constant.items():
+        lines.append(f"{column} = {value or 'null'} (same in every row)")
+
+    if varying:
+        lines.append(" | ".join(columns[i] for i in varying))
+        used = count_tokens("\n".join(lines))
+        for shown, row in enumerate(table):
+            line = " | ".join(row[i] or "null" for i in varying)
+            cost = count_tokens(line) + 1
+            if used + cost > max_tokens:
+                lines.append(f"... ({len(table) - shown} more rows not shown)")
+                break
+            lines.append(line)
+            used += cost
+    return "\n".join(lines)
@@ -0,0 +1,127 @@
+# Streams Cypher results from a Neo4j session and pages through them with opaque continuation tokens
+
+import itertools
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from neo4j import Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+CURSOR_TTL_SECONDS = 300
+MAX_OPEN_CURSORS = 16
+
+
+def stream_records(driver, database: str, query: str, params: dict, fetch_size: int):
+    """Yields result rows as dicts, pulling `fetch_size` records at a time.
+
+    The session stays open until the generator is exhausted or closed.
+    """
+    with driver.session(database=database, fetch_size=fetch_size) as session:
+        result = session.run(Query(query), params or {})
+        for record in result:
+            yield record.data()
+
+
+class _Cursor:
+    def __init__(self, records, ttl: float):
+        # The original stream is kept so close() reaches the generator's session
+        self.records = records
+        # Look-ahead row read past the previous page, served first by the next one
+        self._peek = []
+        self.lock = threading.Lock()
+        self.ttl = ttl
+        self.touch()
+
+    def touch(self):
+        self.expires_at = time.monotonic() + self.ttl
+
+    def take(self, page_size: int) -> tuple[list[dict], bool]:
+        """Returns the next page and whether more rows may follow."""
+        with self.lock:
+            page = self._peek + list(
+                itertools.islice(self.records, page_size + 1 - len(self._peek))
+            )
+            self.touch()
+            if len(page) > page_size:
+                # Hold the look-ahead row back for the next page
+                self._peek = [page.pop()]
+                return page, True
+            self._peek = []
+            return page, False
+
+    def close(self):
+        with self.lock:
+            self._peek = []
+            close = getattr(self.records, "close", None)
+            if close:
+                close()
+
+
+class CursorRegistry:
+    """Open result streams keyed by opaque continuation tokens.
+
+    Cursors expire after `ttl` seconds without a page request, and the oldest
+    cursor is closed when more than `max_open` are open, so abandoned clients
+    cannot hold Neo4j sessions indefinitely.
+    """
+
+    def __init__(
+        self, ttl: float = CURSOR_TTL_SECONDS, max_open: int = MAX_OPEN_CURSORS
+    ):
+        self.ttl = ttl
+        self.max_open = max_open
+        self._cursors: OrderedDict[str, _Cursor] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [t for t, c in self._cursors.items() if c.expires_at < now]
+        evicted = [self._cursors.pop(t) for t in expired]
+        while len(self._cursors) > self.max_open:
+            evicted.append(self._cursors.popitem(last=False)[1])
+        return evicted
+
+    def open(self, records, page_size: int) -> tuple[list[dict], str | None]:
+        """Starts paging `records`; returns the first page and a token for the next one."""
+        cursor = _Cursor(iter(records), self.ttl)
+        page, more = cursor.take(page_size)
+        if not more:
+            cursor.close()
+            return page, None
+
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._cursors[token] = cursor
+            evicted = self._evict()
+        for old in evicted:
+            old.close()
+        return page, token
+
+    def next_page(self, token: str, page_size: int) -> tuple[list[dict], str | None]:
+        """Returns the page after `token` and the token for the page after it.
+
+        Raises KeyError if the token is unknown or has expired.
+        """
+        with self._lock:
+            evicted = self._evict()
+            cursor = self._cursors.pop(token, None)
+        for old in evicted:
+            old.close()
+        if cursor is None:
+            raise KeyError(token)
+
+        page, more = cursor.take(page_size)
+        if not more:
+            cursor.close()
+            return page, None
+
+        # Each page gets a fresh token, so a token can only be used once
+        next_token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._cursors[next_token] = cursor
+        logging.info(f"📄 Served page of {len(page)} rows, more available")
+        return page, next_token
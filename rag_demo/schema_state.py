@@ -0,0 +1,48 @@
+# Immutable snapshot of the parsed graph schema, replaced whole on every reload.
+#
+# The refresher thread reloads the schema while requests are running, so
+# nothing mutates a snapshot in place: a reload builds a new SchemaState and
+# swaps it in with one assignment, and each request keeps the snapshot it
+# started with (RequestContext.schema).
+
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class SchemaState:
+    text: str = ""
+    labels: frozenset[str] = frozenset()
+    relationships: frozenset[str] = frozenset()
+    # {relationship type: [(start label, end label), ...]}
+    endpoints: dict = field(default_factory=dict)
+    # Labels matched on the indexed __norm_* properties (see normalize_properties)
+    shadow_labels: frozenset[str] = frozenset()
+    shadow_alias_labels: frozenset[str] = frozenset()
+
+    @property
+    def labels_str(self) -> str:
+        return "\n".join(f"- {label}" for label in sorted(self.labels))
+
+    @property
+    def rels_str(self) -> str:
+        return "\n".join(f"- {rel}" for rel in sorted(self.relationships))
+
+    @property
+    def prompt_str(self) -> str:
+        """Label and relationship listing for the schema-enforced interpreter."""
+        return (
+            f"Available Labels:\n{self.labels_str}"
+            f"\n\nAvailable Relationships:\n{self.rels_str}\n"
+        )
+
+
+_schema_state = SchemaState()
+
+
+def get_schema_state() -> SchemaState:
+    return _schema_state
+
+
+def set_schema_state(schema_state: SchemaState):
+    global _schema_state
+    _schema_state = schema_state
@@ -38,6 +38,17 @@ def sidebar():
             unsafe_allow_html=True,
         )
 
+        # Optional user-supplied key; used for every LLM call in this session
+        st.text_input(
+            "OpenAI API Key",
+            type="password",
+            key="USER_OPENAI_KEY",
+            help=(
+                "Used for every question in this session as soon as it is "
+                "entered. Without one, the free questions run on the app's key."
+            ),
+        )
+
         # Section Title
         st.markdown("**Questions you can ask:**")
 
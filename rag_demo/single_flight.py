@@ -0,0 +1,75 @@
+# Coalesces identical in-flight questions so concurrent duplicates share one pipeline run
+
+import hashlib
+import logging
+import re
+import threading
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def flight_key(question: str, history: str = "", api_key: str = None) -> str:
+    """Builds the coalescing key from the normalized question, history and API key.
+
+    Runs on different keys never share a result: each is billed to, and can
+    fail on, its own key. Callers that only ever use the app key can omit it.
+    """
+    normalized = re.sub(r"\s+", " ", question).strip().lower().rstrip("?.! ")
+    return f"{normalized}|{_hash(history)}|{_hash(api_key)}"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time.
+
+    Callers that arrive while a computation for the same key is running wait
+    for it and receive its result (or its exception) instead of starting
+    their own. Nothing is cached once the computation finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+
+    def do(self, key: str, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            logging.info(f"🔁 Joining in-flight request for: {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logging.info(f"🔁 Shared result with {call.waiters} waiting request(s)")
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
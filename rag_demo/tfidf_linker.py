@@ -0,0 +1,57 @@
+# Scored entity linking with character n-gram TF-IDF vectors and sparse top-k search
+
+import re
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+_SEPARATORS_RE = re.compile(r"[\W_]+")
+
+
+def _preprocess(text: str) -> str:
+    return _SEPARATORS_RE.sub(" ", text.lower()).strip()
+
+
+class TfidfLinker:
+    """Links literals to the most similar names of one label.
+
+    Names are embedded once into an L2-normalized sparse char-n-gram TF-IDF
+    matrix. All literals of a request are scored with one sparse matrix
+    product, and the top-k per literal is taken from each row's non-zeros.
+    """
+
+    def __init__(self, names: list[str]):
+        self.names = np.array(sorted(set(names)), dtype=object)
+        self.vectorizer = TfidfVectorizer(
+            analyzer="char_wb",
+            ngram_range=(2, 4),
+            preprocessor=_preprocess,
+            sublinear_tf=True,
+            dtype=np.float32,
+        )
+        if len(self.names):
+            self.matrix = self.vectorizer.fit_transform(self.names).T.tocsr()
+        else:
+            self.matrix = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def top_k(self, literals: list[str], k: int = 3) -> list[list[tuple[float, str]]]:
+        """Returns, per literal, up to `k` (cosine score, name) pairs, best first."""
+        if self.matrix is None or not literals:
+            return [[] for _ in literals]
+        scores = (self.vectorizer.transform(literals) @ self.matrix).tocsr()
+
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            data = scores.data[start:end]
+            columns = scores.indices[start:end]
+            if len(data) > k:
+                best = np.argpartition(-data, k)[:k]
+            else:
+                best = np.arange(len(data))
+            best = best[np.argsort(-data[best])]
+            results.append([(float(data[i]), self.names[columns[i]]) for i in best])
+        return results
@@ -0,0 +1,165 @@
+# Token accounting for prompts: measures each section and trims the least important ones to fit a stage budget
+
+import functools
+import logging
+import time
+from dataclasses import dataclass
+
+import streamlit as st
+import tiktoken
+
+TRUNCATION_MARKER = " ...[truncated]"
+
+# Default prompt budgets (tokens) per pipeline stage, overridable with a
+# [TOKEN_BUDGETS] table in secrets.toml
+STAGE_TOKEN_BUDGETS = {
+    "interpreter": 4000,
+    "schema-interpreter": 6000,
+    "cypher": 16000,
+    "final": 8000,
+    # Share of the final prompt reserved for the compacted database output
+    "final-result": 4000,
+}
+
+
+@dataclass
+class PromptSection:
+    name: str
+    text: str
+    # Higher priority sections are trimmed last
+    priority: int = 0
+    # Fixed sections (instructions, templates) are measured but never trimmed
+    trimmable: bool = True
+    # Below this many tokens a trimmed section is dropped instead
+    min_tokens: int = 20
+
+
+# After a failed load, tiktoken is retried at most this often (seconds)
+ENCODING_RETRY_SECONDS = 300
+
+_encoding_failed_at: dict[str, float] = {}
+
+
+@functools.lru_cache(maxsize=8)
+def _load_encoding(model: str):
+    # lru_cache does not cache exceptions, so only successful loads stick
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def _encoding(model: str):
+    failed_at = _encoding_failed_at.get(model)
+    if failed_at is not None and time.monotonic() - failed_at < ENCODING_RETRY_SECONDS:
+        return None
+    try:
+        encoding = _load_encoding(model)
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; estimate when offline
+        _encoding_failed_at[model] = time.monotonic()
+        logging.warning(f"tiktoken unavailable, estimating token counts: {e}")
+        return None
+    _encoding_failed_at.pop(model, None)
+    return encoding
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        # ~4 characters per token for English text
+        return (len(text or "") + 3) // 4
+    return len(encoding.encode(text or "", disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Cuts `text` to at most `max_tokens` tokens, marker included."""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    keep = max_tokens - count_tokens(TRUNCATION_MARKER, model)
+    if keep <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[: keep * 4].rstrip() + TRUNCATION_MARKER
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:keep]).rstrip() + TRUNCATION_MARKER
+
+
+def stage_budget(stage: str) -> int:
+    try:
+        overrides = st.secrets.get("TOKEN_BUDGETS", {})
+    except Exception:
+        overrides = {}
+    return int(overrides.get(stage, STAGE_TOKEN_BUDGETS[stage]))
+
+
+def fit_sections(
+    stage: str, sections: list[PromptSection], budget: int = None
+) -> dict[str, str]:
+    """Returns section texts that fit the stage budget, keyed by section name.
+
+    Sections are trimmed in order of increasing priority until the total fits;
+    the per-section breakdown is logged either way.
+    """
+    budget = budget or stage_budget(stage)
+    counts = {section.name: count_tokens(section.text) for section in sections}
+    fitted = {section.name: section.text for section in sections}
+    total = sum(counts.values())
+
+    overflow = total - budget
+    for section in sorted(sections, key=lambda s: s.priority):
+        if overflow <= 0:
+            break
+        if not section.trimmable or not counts[section.name]:
+            continue
+        keep = max(counts[section.name] - overflow, 0)
+        if keep < section.min_tokens:
+            keep = 0
+        fitted[section.name] = truncate_tokens(section.text, keep)
+        trimmed_count = count_tokens(fitted[section.name])
+        overflow -= counts[section.name] - trimmed_count
+        counts[section.name] = trimmed_count
+
+    breakdown = ", ".join(f"{name}={count}" for name, count in counts.items())
+    final_total = sum(counts.values())
+    if final_total < total:
+        logging.warning(
+            f"✂️ {stage} prompt trimmed {total} → {final_total} tokens (budget {budget}): {breakdown}"
+        )
+    else:
+        logging.info(f"📏 {stage} prompt {total} tokens (budget {budget}): {breakdown}")
+    if overflow > 0:
+        logging.warning(f"⚠️ {stage} prompt still {overflow} tokens over budget")
+    return fitted
+
+
+def fit_turns(
+    stage: str, fixed: list[PromptSection], turns: list[dict], budget: int = None
+) -> list[dict]:
+    """Keeps the most recent history turns that fit next to the fixed sections.
+
+    Whole turns are kept or dropped (oldest first) so chat messages stay intact.
+    """
+    budget = budget or stage_budget(stage)
+    counts = {section.name: count_tokens(section.text) for section in fixed}
+    available = budget - sum(counts.values())
+
+    kept = []
+    used = 0
+    for turn in reversed(turns):
+        cost = count_tokens(turn["input"]) + count_tokens(turn["output"])
+        if used + cost > available:
+            break
+        kept.insert(0, turn)
+        used += cost
+
+    counts["history"] = used
+    breakdown = ", ".join(f"{name}={count}" for name, count in counts.items())
+    dropped = len(turns) - len(kept)
+    message = f"📏 {stage} prompt {sum(counts.values())} tokens (budget {budget}): {breakdown}"
+    if dropped:
+        logging.warning(f"{message} — dropped {dropped} oldest turn(s)")
+    else:
+        logging.info(message)
+    return kept
@@ -0,0 +1,71 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# --- Configuration ---
+# Fires distinct questions at one threaded text2cypher server at the same time
+# and checks that no request picks up another request's state.
+
+API_URL = "http://127.0.0.1:8000/api/text2cypher"
+HEADERS = {"Content-Type": "application/json"}
+WORKERS = 8
+
+QUESTIONS = [
+    "Show all experiments using AGCM models",
+    "Show me all variables related to the model 'HadGEM3-GC31-LL'",
+    "What is the frequency, resolution, and realm associated with the model 'NorESM2-LM'?",
+    "Show the components, shared models, and realm for ACCESS models",
+    "Which driving models are linked to regional climate models that predict variable pr?",
+    "Show regional climate models that predict precipitation over Florida, USA",
+]
+
+# ---------------------
+
+
+def ask(question):
+    response = requests.post(
+        API_URL, headers=HEADERS, json={"question": question}, timeout=300
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def instance_literals(data):
+    return {tuple(t)[0] for t in data.get("instance_triples") or []}
+
+
+def main():
+    print(f"Running {len(QUESTIONS)} questions sequentially for a baseline...")
+    baseline = {q: ask(q) for q in QUESTIONS}
+
+    print(f"Running {len(QUESTIONS) * 2} requests with {WORKERS} workers...")
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        concurrent = list(zip(QUESTIONS * 2, pool.map(ask, QUESTIONS * 2)))
+
+    failures = 0
+    for question, data in concurrent:
+        if data.get("input_question") != question:
+            failures += 1
+            print(f"❌ Response for '{question}' echoed '{data.get('input_question')}'")
+            continue
+
+        # Entities matched for another question must never leak into this one
+        own = instance_literals(baseline[question])
+        others = set().union(
+            *(instance_literals(baseline[q]) for q in QUESTIONS if q != question)
+        )
+        leaked = (instance_literals(data) - own) & (others - own)
+        if leaked:
+            failures += 1
+            print(f"❌ '{question}' picked up entities from other requests: {leaked}")
+
+    print(json.dumps({"requests": len(concurrent), "failures": failures}))
+    if failures:
+        sys.exit(1)
+    print("✅ No cross-request state detected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import streamlit as st
+
+# rag_demo modules import each other by bare name, as when run from that folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "rag_demo"))
+
+SCHEMA = {
+    "schema": (
+        "Node properties:\nSource {name: STRING}\nVariable {name: STRING}\n"
+        "The relationships:\n(:Source)-[:PRODUCES_VARIABLE]->(:Variable)"
+    ),
+    "structured_schema": {
+        "node_props": {},
+        "rel_props": {},
+        "relationships": [
+            {"start": "Source", "type": "PRODUCES_VARIABLE", "end": "Variable"}
+        ],
+    },
+}
+
+
+@pytest.fixture(scope="session")
+def rag_agent(tmp_path_factory):
+    """Imports rag_agent offline, on a replay cassette holding only a schema."""
+    path = tmp_path_factory.mktemp("cassette") / "schema.jsonl"
+    entry = {"kind": "schema", "key": "", "request": {}, "response": SCHEMA}
+    path.write_text(json.dumps(entry) + "\n")
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(
+        st,
+        "secrets",
+        {
+            "NEO4J_URI": "bolt://localhost:7687",
+            "NEO4J_USERNAME": "neo4j",
+            "NEO4J_PASSWORD": "unused",
+            "OPENAI_API_KEY": "unused",
+            "CASSETTE_MODE": "replay",
+            "CASSETTE_PATH": str(path),
+        },
+    )
+    import rag_agent
+
+    yield rag_agent
+    patch.undo()
@@ -0,0 +1,31 @@
+import threading
+import time
+
+from analytics import QUEUE_SIZE, AnalyticsDispatcher
+
+
+class BlockingSink:
+    def __init__(self):
+        self.release = threading.Event()
+        self.sending = threading.Event()
+
+    def send(self, events: list[dict]):
+        self.sending.set()
+        self.release.wait(timeout=10)
+
+
+def test_enqueue_does_not_wait_for_a_slow_sink():
+    sink = BlockingSink()
+    dispatcher = AnalyticsDispatcher(sink)
+    dispatcher.enqueue({"properties": {}})
+    assert sink.sending.wait(timeout=10)
+
+    try:
+        for _ in range(QUEUE_SIZE + 10):
+            dispatcher.enqueue({"properties": {}})
+        start = time.perf_counter()
+        dispatcher.enqueue({"properties": {}})
+        assert time.perf_counter() - start < 0.5
+        assert dispatcher.stats()["dropped"] == 11
+    finally:
+        sink.release.set()
@@ -0,0 +1,56 @@
+import cache_refresher
+from cache_refresher import CacheRefresher, graph_fingerprint
+from lexicon import EntityLexicon, get_lexicon, set_lexicon
+
+
+class CountGraph:
+    """Answers the fingerprint queries from a {label: node count} dict."""
+
+    structured_schema = {"relationships": []}
+
+    def __init__(self, counts: dict[str, int]):
+        self.counts = counts
+
+    def query(self, query: str, params: dict = None) -> list[dict]:
+        if query.startswith("CALL db.labels()"):
+            return [{"label": label} for label in self.counts]
+        if query.startswith("CALL db.relationshipTypes()"):
+            return []
+        if query.startswith("SHOW INDEXES"):
+            return []
+        label = query.split("`")[1]
+        return [{"count": self.counts[label]}]
+
+
+def test_failed_rebuild_is_retried_on_the_next_poll(monkeypatch):
+    graph = CountGraph({"Source": 1})
+    refresher = CacheRefresher(graph, {"Source": ["name"]}, ["Source"])
+    refresher.fingerprint = graph_fingerprint(graph)
+    set_lexicon(EntityLexicon())
+    monkeypatch.setattr(cache_refresher, "load_label_stats", lambda graph, label: {})
+
+    calls = []
+
+    def build_label_slice(graph, label, properties):
+        calls.append(label)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return "matcher", "linker"
+
+    monkeypatch.setattr(cache_refresher, "build_label_slice", build_label_slice)
+    graph.counts["Source"] = 2
+
+    try:
+        refresher.refresh_once()
+    except RuntimeError:
+        pass
+    assert refresher.fingerprint == {":Source": 1}
+    assert refresher.metrics["last_check"] is None
+    assert refresher.stats()["staleness_seconds"] is None
+
+    refresher.refresh_once()
+    assert calls == ["Source", "Source"]
+    assert refresher.fingerprint == {":Source": 2}
+    assert refresher.metrics["labels_rebuilt"] == 1
+    assert get_lexicon().slices["Source"] == ("matcher", "linker")
+    assert refresher.stats()["staleness_seconds"] is not None
@@ -0,0 +1,80 @@
+import pytest
+
+from cypher_params import parameterize_cypher
+
+
+@pytest.mark.parametrize(
+    "literal, value",
+    [
+        (r"'a\tb'", "a\tb"),
+        (r"'\b\f\n\r'", "\b\f\n\r"),
+        (r"'it\'s \"x\" \\ y'", "it's \"x\" \\ y"),
+        (r"'café'", "café"),
+        (r"'\U0001F600'", "😀"),
+    ],
+)
+def test_string_escapes_are_decoded(literal, value):
+    query, params = parameterize_cypher(f"MATCH (n) WHERE n.name = {literal} RETURN n")
+    assert query == "MATCH (n) WHERE n.name = $p0 RETURN n"
+    assert params == {"p0": value}
+
+
+@pytest.mark.parametrize("literal", [r"'\q'", r"'\u00zz'", r"'\U0001F6'"])
+def test_invalid_escapes_leave_the_query_unchanged(literal):
+    original = f"MATCH (n) WHERE n.name = {literal} AND n.x = 3 RETURN n"
+    assert parameterize_cypher(original) == (original, {})
+
+
+def test_numbers_become_typed_parameters():
+    query, params = parameterize_cypher(
+        "MATCH (n) WHERE n.count > 10 AND n.ratio < 0.5 AND n.big = 1e3 RETURN n"
+    )
+    assert query == (
+        "MATCH (n) WHERE n.count > $p0 AND n.ratio < $p1 AND n.big = $p2 RETURN n"
+    )
+    assert params == {"p0": 10, "p1": 0.5, "p2": 1000.0}
+    assert isinstance(params["p0"], int)
+
+
+@pytest.mark.parametrize(
+    "pattern", ["[:PRODUCES_VARIABLE*1..3]", "[*2]", "[*..4]", "[:REL*]"]
+)
+def test_variable_length_ranges_are_kept(pattern):
+    original = f"MATCH (a)-{pattern}->(b) RETURN b"
+    assert parameterize_cypher(original) == (original, {})
+
+
+def test_digits_inside_identifiers_are_kept():
+    query, params = parameterize_cypher(
+        "MATCH (s1:Source)-[:PRODUCES_VARIABLE]->(v2) WHERE v2.level3 = 7 "
+        "RETURN s1.cmip6_id"
+    )
+    assert query == (
+        "MATCH (s1:Source)-[:PRODUCES_VARIABLE]->(v2) WHERE v2.level3 = $p0 "
+        "RETURN s1.cmip6_id"
+    )
+    assert params == {"p0": 7}
+
+
+def test_backticked_names_are_copied_verbatim():
+    query, params = parameterize_cypher(
+        "MATCH (n:`Label 2`) WHERE n.`prop '3'` = 'x' RETURN n"
+    )
+    assert query == "MATCH (n:`Label 2`) WHERE n.`prop '3'` = $p0 RETURN n"
+    assert params == {"p0": "x"}
+
+
+def test_comments_are_copied_verbatim():
+    query, params = parameterize_cypher(
+        "MATCH (n) // LIMIT 10 'x'\nWHERE n.a = 1 /* 'y' 2 */ RETURN n"
+    )
+    assert query == "MATCH (n) // LIMIT 10 'x'\nWHERE n.a = $p0 /* 'y' 2 */ RETURN n"
+    assert params == {"p0": 1}
+
+
+def test_existing_parameters_are_kept_and_not_reused():
+    query, params = parameterize_cypher(
+        "MATCH (n) WHERE n.name = $p0 AND n.age = 30 RETURN n", {"p0": "tas"}
+    )
+    assert query == "MATCH (n) WHERE n.name = $p0 AND n.age = $p1 RETURN n"
+    assert params == {"p0": "tas", "p1": 30}
@@ -0,0 +1,21 @@
+from gazetteer import GEO_LABELS, Gazetteer
+
+
+def build_gazetteer() -> Gazetteer:
+    gazetteer = Gazetteer(GEO_LABELS)
+    gazetteer.add_node("City", "c1", "Over", [])
+    gazetteer.add_node("City", "c2", "Near", [])
+    gazetteer.add_node("Country_Subdivision", "s1", "Florida", [])
+    gazetteer.add_node("Country", "k1", "United States", ["USA"])
+    gazetteer.freeze()
+    return gazetteer
+
+
+def test_stopwords_are_not_read_as_places():
+    gazetteer = build_gazetteer()
+    places = gazetteer.find_places("over Florida, USA", full_cover=True)
+    assert [(phrase, label) for phrase, label, _, _ in places] == [
+        ("Florida", "Country_Subdivision"),
+        ("USA", "Country"),
+    ]
+    assert gazetteer.find_places("near") == []
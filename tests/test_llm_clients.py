@@ -0,0 +1,47 @@
+import time
+
+from langchain_community.chat_models.fake import FakeListChatModel
+
+from llm_clients import LatencyBudgetedModel
+
+
+class SlowChatModel(FakeListChatModel):
+    """Fake chat model whose non-streaming call takes `delay` seconds."""
+
+    delay: float = 1.0
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return super()._call(*args, **kwargs)
+
+
+def test_falls_back_when_primary_exceeds_budget():
+    model = LatencyBudgetedModel(
+        "cypher",
+        SlowChatModel(responses=["slow answer"], delay=2.0),
+        FakeListChatModel(responses=["fast answer"]),
+        latency_budget=0.2,
+    )
+    start = time.perf_counter()
+    answer = model.invoke("question")
+    elapsed = time.perf_counter() - start
+
+    assert answer.content == "fast answer"
+    assert elapsed < 1.0
+
+
+def test_keeps_primary_answer_within_budget():
+    model = LatencyBudgetedModel(
+        "cypher",
+        SlowChatModel(responses=["primary answer"], delay=0.0),
+        FakeListChatModel(responses=["fallback answer"]),
+        latency_budget=1.0,
+    )
+    assert model.invoke("question").content == "primary answer"
+
+
+def test_without_fallback_waits_for_primary():
+    model = LatencyBudgetedModel(
+        "cypher", SlowChatModel(responses=["only answer"], delay=0.3), None, 0.1
+    )
+    assert model.invoke("question").content == "only answer"
@@ -0,0 +1,13 @@
+from negative_cache import NegativeCache
+
+
+def test_misses_are_remembered_per_candidate_labels():
+    cache = NegativeCache()
+    cache.set_fingerprint({":City": 1})
+    cache.add("Florida, USA", [])
+
+    assert cache.contains("florida,  usa", [])
+    assert "Florida, USA" in cache
+    # Typed as a place it may resolve with partial cover, so it is tried again
+    assert not cache.contains("Florida, USA", ["Country_Subdivision", "City"])
+    assert cache.contains("?", ["City"])
@@ -0,0 +1,32 @@
+from lexicon import load_label_names
+from property_metadata import describe_label
+
+EMBEDDING = [0.1] * 256
+
+
+class SanitizedGraph:
+    """Returns rows the way Neo4jGraph(sanitize=True) does: long lists dropped."""
+
+    def __init__(self, values: dict[str, list]):
+        self.values = values
+
+    def query(self, query: str, params: dict = None) -> list[dict]:
+        prop = query.split("`")[3]
+        return [
+            {} if isinstance(value, list) and len(value) >= 128 else {"value": value}
+            for value in self.values[prop]
+        ]
+
+
+def test_sanitized_embeddings_are_excluded():
+    graph = SanitizedGraph({"name": ["tas", "pr"], "embedding": [EMBEDDING] * 3})
+    infos = describe_label(graph, "Variable", ["name", "embedding"])
+    assert [(i.name, i.matchable, i.reason) for i in infos] == [
+        ("name", True, ""),
+        ("embedding", False, "numeric list"),
+    ]
+
+
+def test_lexicon_skips_sanitized_rows():
+    graph = SanitizedGraph({"name": ["tas"], "embedding": [EMBEDDING]})
+    assert load_label_names(graph, "Variable", ["name", "embedding"]) == (["tas"], [])
@@ -0,0 +1,37 @@
+from lexicon import EntityLexicon, get_lexicon, set_lexicon
+from schema_state import SchemaState
+
+
+class ScoredLinker:
+    """Linker returning fixed (score, name) candidates for every literal."""
+
+    def __init__(self, found: list[tuple[float, str]]):
+        self.found = found
+
+    def __len__(self) -> int:
+        return len(self.found)
+
+    def top_k(self, literals, k=3):
+        return [self.found for _ in literals]
+
+
+def test_links_compare_scores_within_a_label(rag_agent, monkeypatch):
+    previous = get_lexicon()
+    lexicon = EntityLexicon(
+        {
+            "Source": (None, ScoredLinker([(0.80, "NOAA-GFDL")])),
+            "Variable": (None, ScoredLinker([(0.95, "tas")])),
+        }
+    )
+    monkeypatch.setattr(lexicon, "min_scores", {"Source": 0.5, "Variable": 0.9})
+    set_lexicon(lexicon)
+    schema = SchemaState(labels=frozenset({"Source", "Variable"}))
+    try:
+        # Typed labels win even over a higher raw score elsewhere
+        linked = rag_agent._link_literals({"noaa": ["Source"]}, schema)
+        assert linked == {"noaa": ("Source", "NOAA-GFDL")}
+        # Untyped, 0.80 clears Source's minimum by more than 0.95 clears Variable's
+        linked = rag_agent._link_literals({"noaa": []}, schema)
+        assert linked == {"noaa": ("Source", "NOAA-GFDL")}
+    finally:
+        set_lexicon(previous)
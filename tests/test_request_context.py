@@ -0,0 +1,85 @@
+import threading
+import urllib.parse
+
+# Each question yields its own triples, so any cross-talk shows up in the result
+TRIPLES = {
+    "Which sources produce variables?": [("Source", "PRODUCES_VARIABLE", "Variable")],
+    "Which variables are produced?": [("Variable", "PRODUCES_VARIABLE", "Source")],
+}
+
+
+def test_overlapping_requests_keep_their_own_state(rag_agent, monkeypatch):
+    from request_context import RequestContext
+    from schema_state import SchemaState, get_schema_state, set_schema_state
+
+    # Both requests must be inside each stage at the same time to pass it
+    interpreting = threading.Barrier(2, timeout=10)
+    querying = threading.Barrier(2, timeout=10)
+    loaded_schema = get_schema_state()
+
+    def interpret_question(question, history, api_key=None):
+        interpreting.wait()
+        # A schema reload mid-request must not affect requests already running
+        set_schema_state(SchemaState())
+        return question, TRIPLES[question]
+
+    class GraphCypherTool:
+        def invoke(self, payload, config=None):
+            querying.wait()
+            query = f"MATCH (n) RETURN '{payload['question']}' AS question"
+            return {
+                "result": [{"question": payload["question"]}],
+                "intermediate_steps": [{"query": urllib.parse.quote(query)}],
+            }
+
+    monkeypatch.setattr(rag_agent, "interpret_question", interpret_question)
+    monkeypatch.setattr(rag_agent, "graph_cypher_tool", GraphCypherTool())
+
+    contexts = [RequestContext(question=question) for question in TRIPLES]
+    errors = []
+
+    def run(ctx):
+        try:
+            rag_agent.extract_triples(ctx)
+            rag_agent.query_graph(ctx)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(ctx,)) for ctx in contexts]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+    finally:
+        set_schema_state(loaded_schema)
+
+    assert not errors
+    for ctx in contexts:
+        assert ctx.schema is loaded_schema
+        assert ctx.rewritten == ctx.question
+        assert ctx.verified_triples == TRIPLES[ctx.question]
+        assert ctx.result == [{"question": ctx.question}]
+        assert ctx.question in ctx.cypher_query
+
+
+def test_replay_uses_the_recorded_extraction_plan(rag_agent, monkeypatch):
+    from cassette import get_cassette
+    from request_context import RequestContext
+
+    # Live stats would have adapted; a replay must not follow them
+    monkeypatch.setattr(
+        rag_agent.extraction_stats, "plan", lambda bucket, max_attempts: ("schema", 2)
+    )
+    recorded = RequestContext(question="Which sources produce variables?")
+    unrecorded = RequestContext(question="Which variables are produced?")
+    request = {
+        "question": recorded.question,
+        "history": recorded.conversation_text,
+        "bucket": "which|Source",
+        "max_attempts": 5,
+    }
+    get_cassette().record("plan", request, ["schema", 3])
+
+    assert rag_agent._extraction_plan(recorded, "which|Source", 5) == ("schema", 3)
+    assert rag_agent._extraction_plan(unrecorded, "which|Variable", 5) == ("free", 5)
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from result_cursor import CursorRegistry, stream_records
+
+
+class Record(dict):
+    def data(self) -> dict:
+        return dict(self)
+
+
+class Session:
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def run(self, query, params):
+        return (Record(row=i) for i in range(self.rows))
+
+
+class Driver:
+    def __init__(self, rows: int):
+        self.sessions = []
+        self.rows = rows
+
+    def session(self, database=None, fetch_size=None):
+        session = Session(self.rows)
+        self.sessions.append(session)
+        return session
+
+
+# Held so a stream is only closed by the registry, not by garbage collection
+_streams = []
+
+
+def open_stream(registry, rows: int, page_size: int):
+    driver = Driver(rows)
+    records = stream_records(driver, "neo4j", "MATCH (n) RETURN n", {}, 10)
+    _streams.append(records)
+    page, token = registry.open(records, page_size)
+    return driver.sessions[0], page, token
+
+
+def test_session_closes_when_the_first_page_exhausts_the_stream():
+    session, page, token = open_stream(CursorRegistry(), rows=2, page_size=5)
+    assert page == [{"row": 0}, {"row": 1}]
+    assert token is None
+    assert session.closed
+
+
+@pytest.mark.parametrize("rows", [3, 4])
+def test_session_closes_when_the_last_page_starts_with_the_peeked_row(rows):
+    registry = CursorRegistry()
+    session, page, token = open_stream(registry, rows=rows, page_size=2)
+    assert len(page) == 2 and token is not None
+    assert not session.closed
+
+    page, token = registry.next_page(token, 2)
+    assert page == [{"row": i} for i in range(2, rows)]
+    assert token is None
+    assert session.closed
+
+
+def test_evicted_cursor_closes_its_session():
+    registry = CursorRegistry(max_open=1)
+    first, _, first_token = open_stream(registry, rows=10, page_size=2)
+    second, _, _ = open_stream(registry, rows=10, page_size=2)
+    assert first.closed
+    assert not second.closed
+    with pytest.raises(KeyError):
+        registry.next_page(first_token, 2)
+
+
+def test_expired_cursor_closes_its_session():
+    registry = CursorRegistry(ttl=0.01)
+    session, _, token = open_stream(registry, rows=10, page_size=2)
+    time.sleep(0.05)
+    with pytest.raises(KeyError):
+        registry.next_page(token, 2)
+    assert session.closed
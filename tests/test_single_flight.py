@@ -0,0 +1,10 @@
+from single_flight import flight_key
+
+
+def test_flight_key_separates_api_keys():
+    assert flight_key("Which sources?", "", "sk-a") == flight_key(
+        "which sources", "", "sk-a"
+    )
+    assert flight_key("Which sources?", "", "sk-a") != flight_key(
+        "Which sources?", "", "sk-b"
+    )
@@ -0,0 +1,28 @@
+import token_budget
+
+
+class Encoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def test_a_failed_encoding_load_is_retried(monkeypatch):
+    calls = []
+
+    def encoding_for_model(model):
+        calls.append(model)
+        if len(calls) == 1:
+            raise OSError("offline")
+        return Encoding()
+
+    monkeypatch.setattr(token_budget.tiktoken, "encoding_for_model", encoding_for_model)
+    monkeypatch.setattr(token_budget, "_encoding_failed_at", {})
+    token_budget._load_encoding.cache_clear()
+    try:
+        # Offline: estimated at ~4 characters per token
+        assert token_budget.count_tokens("one two three", "test-model") == 4
+        monkeypatch.setattr(token_budget, "ENCODING_RETRY_SECONDS", 0)
+        assert token_budget.count_tokens("one two three", "test-model") == 3
+        assert calls == ["test-model", "test-model"]
+    finally:
+        token_budget._load_encoding.cache_clear()